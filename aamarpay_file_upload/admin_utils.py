@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_count(queryset):
+    """Row estimate from PostgreSQL statistics, None when unavailable"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    try:
+        with connection.cursor() as cursor:
+            if not queryset.query.where:
+                # Unfiltered changelist: table stats, no scan at all
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+                return row[0] if row and row[0] >= 0 else None
+
+            # Filtered or searched: the planner's estimate for the query
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+    except Exception as e:
+        logger.warning(f"Count estimate failed for {queryset.model._meta.label}: {str(e)}")
+        return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that trusts PostgreSQL estimates on large tables instead of
+    running COUNT(*). Small results still get an exact count.
+    """
+
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet):
+            estimate = estimate_count(self.object_list)
+            if estimate is not None and estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables that grow without bound"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
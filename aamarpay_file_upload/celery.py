@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_init, worker_process_shutdown
 from django.conf import settings
 
 # Set the default Django settings module for the 'celery' program.
@@ -19,6 +20,25 @@ if settings.DEBUG:
         task_eager_propagates=True,
     )
 
+@worker_init.connect
+def start_metrics_exporter(**kwargs):
+    # Runs in the main worker process before the pool forks
+    port = int(os.environ.get('CELERY_METRICS_PORT', 0))
+    if port:
+        from .metrics import start_exporter
+        start_exporter(port)
+
+@worker_init.connect
+def close_db_connections(**kwargs):
+    # Connections and pools of the main process would be inherited by every child
+    from .db import close_connections
+    close_connections()
+
+@worker_process_shutdown.connect
+def mark_metrics_process_dead(pid=None, **kwargs):
+    from .metrics import mark_process_dead
+    mark_process_dead(pid or os.getpid())
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
\ No newline at end of file
@@ -0,0 +1,13 @@
+from django.db import connections
+
+
+def close_connections():
+    """
+    Close this process's connections and connection pools before it forks,
+    a socket shared with the children would mix up their queries. Each
+    child opens its own on first use.
+    """
+    for connection in connections.all(initialized_only=True):
+        connection.close()
+        if hasattr(connection, 'close_pool'):
+            connection.close_pool()
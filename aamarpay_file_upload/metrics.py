@@ -0,0 +1,173 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+import os
+
+# Prometheus metrics for the upload, processing and payment paths. With
+# PROMETHEUS_MULTIPROC_DIR set (gunicorn workers, Celery prefork children)
+# every process writes its samples there and the exporters aggregate them.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PROCESSING_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+SIZE_BUCKETS = (1024, 10240, 102400, 262144, 1048576, 5242880, 10485760, 52428800, 104857600)
+THROUGHPUT_BUCKETS = (1e3, 1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7, 1e8)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+# HTTP
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds',
+    'Request latency by view',
+    ['view', 'method', 'status'],
+    buckets=LATENCY_BUCKETS
+)
+REQUEST_DB_QUERIES = Histogram(
+    'http_request_db_queries',
+    'Database queries per request by view',
+    ['view'],
+    buckets=QUERY_BUCKETS
+)
+
+# Uploads
+UPLOAD_SIZE_BYTES = Histogram(
+    'uploads_file_size_bytes',
+    'Size of accepted uploads',
+    ['file_type'],
+    buckets=SIZE_BUCKETS
+)
+
+# Processing
+PROCESSING_QUEUE_WAIT_SECONDS = Histogram(
+    'uploads_processing_queue_wait_seconds',
+    'Time between dispatch and a worker starting the file',
+    buckets=PROCESSING_BUCKETS
+)
+PROCESSING_SECONDS = Histogram(
+    'uploads_processing_duration_seconds',
+    'Time a worker spent on a file',
+    ['file_type', 'outcome'],
+    buckets=PROCESSING_BUCKETS
+)
+PROCESSING_WORDS_PER_SECOND = Histogram(
+    'uploads_wordcount_words_per_second',
+    'Word counting throughput in words per second',
+    ['file_type'],
+    buckets=THROUGHPUT_BUCKETS
+)
+PROCESSING_BYTES_PER_SECOND = Histogram(
+    'uploads_wordcount_bytes_per_second',
+    'Word counting throughput in bytes per second',
+    ['file_type'],
+    buckets=THROUGHPUT_BUCKETS
+)
+
+# Stale processing reaper
+STALE_FILES_REQUEUED = Counter(
+    'uploads_stale_requeued_total',
+    'Files stuck in processing that were re-queued by the reaper'
+)
+STALE_FILES_FAILED = Counter(
+    'uploads_stale_failed_total',
+    'Files stuck in processing that the reaper marked as failed'
+)
+STALE_FILES_FOUND = Gauge(
+    'uploads_stale_found',
+    'Stale files found by the last reaper run',
+    multiprocess_mode='livemostrecent'
+)
+REAPER_LAST_RUN = Gauge(
+    'uploads_reaper_last_run_timestamp_seconds',
+    'Unix time of the last reaper run',
+    multiprocess_mode='max'
+)
+ORPHAN_FILES_FOUND = Gauge(
+    'uploads_orphan_files_found',
+    'Stored files without a FileUpload row found by the last reconciliation',
+    multiprocess_mode='livemostrecent'
+)
+MISSING_FILES_FOUND = Gauge(
+    'uploads_missing_files_found',
+    'FileUpload rows whose stored file is missing, from the last reconciliation',
+    multiprocess_mode='livemostrecent'
+)
+STORAGE_RECLAIMED_BYTES = Counter(
+    'uploads_storage_reclaimed_bytes_total',
+    'Bytes of orphaned files deleted or quarantined by reconciliation'
+)
+RECONCILE_LAST_RUN = Gauge(
+    'uploads_reconcile_last_run_timestamp_seconds',
+    'Unix time of the last storage reconciliation',
+    multiprocess_mode='max'
+)
+
+# Payments
+GATEWAY_SECONDS = Histogram(
+    'payments_gateway_request_duration_seconds',
+    'aamarPay payment initiation latency',
+    ['outcome'],
+    buckets=LATENCY_BUCKETS
+)
+CALLBACK_SECONDS = Histogram(
+    'payments_callback_duration_seconds',
+    'aamarPay callback processing time',
+    ['outcome'],
+    buckets=LATENCY_BUCKETS
+)
+
+
+def get_registry():
+    """Registry to expose, aggregated over all processes in multiprocess mode"""
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint"""
+    token = settings.METRICS_AUTH_TOKEN
+    if not token:
+        # Hidden unless a token is set or the endpoint was made public on purpose
+        if not settings.METRICS_PUBLIC:
+            return HttpResponseNotFound()
+    elif request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+def clear_multiprocess_dir():
+    """Remove samples left by a previous run, call once before workers start"""
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        return
+
+    os.makedirs(path, exist_ok=True)
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name.endswith('.db'):
+                os.remove(entry.path)
+
+
+def mark_process_dead(pid):
+    """Drop live gauges of an exited worker process"""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        multiprocess.mark_process_dead(pid)
+
+
+def start_exporter(port):
+    """Serve metrics over HTTP from a non-web process (Celery worker)"""
+    from prometheus_client import start_http_server
+
+    clear_multiprocess_dir()
+    start_http_server(port, registry=get_registry())
@@ -0,0 +1,159 @@
+from collections import Counter
+from django.conf import settings
+from django.db import connection
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from . import metrics
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+ACCEPTS_BROTLI = re.compile(r"\bbr\b")
+
+# Brotli has no counterpart of the random gzip padding Django adds against
+# BREACH, so pages carrying CSRF tokens stay on gzip
+BROTLI_CONTENT_TYPES = ('application/json', 'application/x-ndjson', 'text/csv')
+
+# Literals and placeholder lists that differ between otherwise identical queries
+SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s|\?")
+SQL_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+
+def query_shape(sql):
+    """SQL with literals and IN lists collapsed, equal for N+1 style repeats"""
+    shape = SQL_LITERALS.sub('?', sql)
+    return SQL_IN_LISTS.sub('(?)', shape)
+
+
+class QueryCounter:
+    """Execute wrapper counting the queries run on a connection"""
+
+    def __init__(self, track_shapes=False):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter() if track_shapes else None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        if self.shapes is not None:
+            self.shapes[query_shape(sql)] += 1
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+
+    def repeated(self, threshold):
+        """Query shapes run at least `threshold` times, most frequent first"""
+        if not self.shapes:
+            return []
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+class MetricsMiddleware:
+    """Records request latency and database queries per view"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter(track_shapes=settings.QUERY_BUDGET_ENABLED)
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.REQUEST_SECONDS.labels(
+            view=view,
+            method=request.method,
+            status=response.status_code
+        ).observe(elapsed)
+        metrics.REQUEST_DB_QUERIES.labels(view=view).observe(counter.count)
+
+        if settings.QUERY_BUDGET_ENABLED:
+            check_query_budget(request, response, view, counter)
+
+        return response
+
+
+def check_query_budget(request, response, view, counter):
+    """Tag the response with its query count and time, log budget offenders and N+1 patterns"""
+    if settings.QUERY_BUDGET_HEADERS:
+        response['X-DB-Query-Count'] = str(counter.count)
+        response['X-DB-Query-Time'] = f"{counter.duration * 1000:.1f}ms"
+
+    budget = settings.QUERY_BUDGET_OVERRIDES.get(view, settings.QUERY_BUDGET)
+    if counter.count > budget:
+        logger.warning(
+            f"Query budget exceeded on {request.method} {request.path} ({view}): "
+            f"{counter.count} queries, budget {budget}, {counter.duration * 1000:.1f}ms"
+        )
+
+    for shape, count in counter.repeated(settings.QUERY_BUDGET_REPEAT_THRESHOLD):
+        logger.warning(
+            f"Possible N+1 on {request.method} {request.path} ({view}): "
+            f"{count} x {shape[:300]}"
+        )
+
+
+def brotli_sequence(sequence, quality):
+    """Brotli counterpart of django.utils.text.compress_sequence"""
+    compressor = brotli.Compressor(quality=quality)
+    for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware with a size threshold (COMPRESSION_MIN_SIZE), and brotli
+    for API and export responses when the client accepts it and the brotli
+    package is installed. Streaming responses such as exports are
+    compressed chunk by chunk.
+    """
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        if (not self.use_brotli(request, response) or response.has_header('Content-Encoding') or
+                (response.streaming and response.is_async)):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        quality = settings.COMPRESSION_BROTLI_QUALITY
+        if response.streaming:
+            response.streaming_content = brotli_sequence(response.streaming_content, quality)
+            del response.headers['Content-Length']
+        else:
+            compressed = brotli.compress(response.content, quality=quality)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # Same weak ETag as GZipMiddleware, conditional requests still match
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
+
+    def use_brotli(self, request, response):
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        return (
+            BROTLI_AVAILABLE and settings.COMPRESSION_BROTLI and
+            content_type in BROTLI_CONTENT_TYPES and
+            bool(ACCEPTS_BROTLI.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+        )
@@ -0,0 +1,28 @@
+from django.db.models import QuerySet
+from django.utils import timezone
+from rest_framework import serializers
+
+
+def format_datetime(value, tz):
+    """DateTimeField's default ISO 8601 output, with the timezone resolved once per list"""
+    if value is None:
+        return None
+    value = value.astimezone(tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+class ValuesListSerializer(serializers.ListSerializer):
+    """
+    many=True for read-only list serializers. A queryset is read with
+    .values(child.values_fields) and each row goes through
+    child.represent_row, no model instances or per-field calls. Other data
+    (e.g. a paginated page) takes the regular path.
+    """
+
+    def to_representation(self, data):
+        if not isinstance(data, QuerySet):
+            return super().to_representation(data)
+        tz = timezone.get_current_timezone()
+        return [self.child.represent_row(row, tz) for row in data.values(*self.child.values_fields)]
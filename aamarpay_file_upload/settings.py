@@ -1,5 +1,7 @@
+from django.core.exceptions import ImproperlyConfigured
 from pathlib import Path
 import environ
+import importlib.util
 import os
 from datetime import timedelta
 
@@ -10,6 +12,11 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 env = environ.Env(
     DEBUG=(bool, False),
     BCRYPT_ROUNDS=(int, 12),
+    PASSWORD_HASHER=(str, 'bcrypt'),
+    ARGON2_TIME_COST=(int, 2),
+    ARGON2_MEMORY_COST=(int, 102400),
+    ARGON2_PARALLELISM=(int, 8),
+    AUTH_HASH_WAIT=(float, 2.0),
     SESSION_COOKIE_SECURE=(bool, False),
     CSRF_COOKIE_SECURE=(bool, False),
     SECURE_SSL_REDIRECT=(bool, False),
@@ -19,6 +26,72 @@ env = environ.Env(
     SECURE_BROWSER_XSS_FILTER=(bool, False),
     SECURE_CONTENT_TYPE_NOSNIFF=(bool, False),
     CACHE_TIMEOUT=(int, 300),
+    UPLOAD_USER_CONCURRENCY=(int, 2),
+    UPLOAD_SMALL_FILE_SIZE=(int, 262144),
+    UPLOAD_PAID_PRIORITY_WINDOW=(int, 3600),
+    UPLOAD_SLOT_TIMEOUT=(int, 900),
+    UPLOAD_DISPATCH_BATCH_SIZE=(int, 100),
+    UPLOAD_DISPATCH_INTERVAL=(int, 10),
+    UPLOAD_PROCESSING_MAX_RETRIES=(int, 5),
+    UPLOAD_RETRY_BACKOFF=(int, 5),
+    UPLOAD_RETRY_BACKOFF_MAX=(int, 600),
+    UPLOAD_OUTBOX_BATCH_SIZE=(int, 500),
+    UPLOAD_STALE_HEARTBEAT_AFTER=(int, 900),
+    UPLOAD_HEARTBEAT_INTERVAL=(int, 60),
+    UPLOAD_PROCESSING_TIME_LIMIT=(int, 3600),
+    UPLOAD_STALE_QUEUED_AFTER=(int, 3600),
+    UPLOAD_PROCESSING_MAX_ATTEMPTS=(int, 3),
+    UPLOAD_REAPER_BATCH_SIZE=(int, 1000),
+    UPLOAD_REAPER_INTERVAL=(int, 300),
+    QUERY_BUDGET_ENABLED=(bool, True),
+    QUERY_BUDGET=(int, 20),
+    QUERY_BUDGET_REPEAT_THRESHOLD=(int, 5),
+    ADMIN_ESTIMATED_COUNT_THRESHOLD=(int, 10000),
+    UPLOAD_SEARCH_ENABLED=(bool, True),
+    UPLOAD_SEARCH_BACKEND=(str, ''),
+    UPLOAD_SEARCH_MAX_TERMS=(int, 10000),
+    UPLOAD_STATS_TOP_TERMS=(int, 10),
+    UPLOAD_STATS_EXACT_TERMS=(int, 200000),
+    UPLOAD_STATS_READING_WPM=(int, 200),
+    UPLOAD_LIGHT_QUEUE=(str, 'celery'),
+    UPLOAD_HEAVY_QUEUE=(str, 'uploads.heavy'),
+    UPLOAD_BULK_MAX_FILES=(int, 100),
+    UPLOAD_BULK_MAX_SIZE=(int, 104857600),
+    UPLOAD_BATCH_TASK_SIZE=(int, 25),
+    UPLOAD_PURGE_BATCH_SIZE=(int, 500),
+    UPLOAD_PURGE_INTERVAL=(int, 300),
+    UPLOAD_ORPHAN_ACTION=(str, 'quarantine'),
+    UPLOAD_ORPHAN_GRACE_PERIOD=(int, 86400),
+    UPLOAD_QUARANTINE_DIR=(str, 'quarantine'),
+    UPLOAD_RECONCILE_CHUNK_SIZE=(int, 2000),
+    UPLOAD_RECONCILE_INTERVAL=(int, 86400),
+    AUTH_TOKEN_CACHE_TTL=(int, 300),
+    AUTH_TOKEN_LOCAL_TTL=(int, 5),
+    AUTH_TOKEN_LOCAL_SIZE=(int, 1024),
+    AUTH_JWT_ENABLED=(bool, False),
+    AUTH_JWT_ACCESS_LIFETIME=(int, 300),
+    AUTH_JWT_REFRESH_LIFETIME=(int, 86400),
+    AUTH_TOKEN_IDLE_TIMEOUT=(int, 1209600),
+    AUTH_TOKEN_MAX_AGE=(int, 7776000),
+    AUTH_TOKEN_ROTATE_AFTER=(int, 86400),
+    AUTH_TOKEN_USAGE_FLUSH_INTERVAL=(int, 60),
+    AUTH_TOKEN_USAGE_FLUSH_SIZE=(int, 500),
+    AUTH_TOKEN_PURGE_BATCH_SIZE=(int, 1000),
+    AUTH_TOKEN_PURGE_INTERVAL=(int, 3600),
+    PAGE_CACHE_TIMEOUT=(int, 600),
+    METRICS_PUBLIC=(bool, False),
+    COMPRESSION_MIN_SIZE=(int, 1024),
+    COMPRESSION_BROTLI=(bool, True),
+    COMPRESSION_BROTLI_QUALITY=(int, 4),
+    EXPORT_CHUNK_SIZE=(int, 2000),
+    DB_CONNECTION_MODE=(str, 'persistent'),
+    DB_CONN_MAX_AGE=(int, 300),
+    DB_CONN_HEALTH_CHECKS=(bool, True),
+    DB_POOL_MIN_SIZE=(int, 1),
+    DB_POOL_MAX_SIZE=(int, 0),
+    DB_POOL_TIMEOUT=(float, 10.0),
+    DB_POOL_MAX_IDLE=(int, 600),
+    DB_POOL_MAX_LIFETIME=(int, 3600),
 )
 
 # Read environment file
@@ -66,21 +139,39 @@ DJ_APPS = [
 
 INSTALLED_APPS = PREINSTALLED_APPS + DJ_APPS
 
-# Password Hashers (with configurable BCrypt rounds)
+# Password Hashers (the first one hashes new passwords, older hashes are upgraded on login)
 PASSWORD_HASHERS = [
-    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "authentication.hashers.TunableBCryptSHA256PasswordHasher",
+    "authentication.hashers.TunableArgon2PasswordHasher",
     "django.contrib.auth.hashers.PBKDF2PasswordHasher",
     "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
-    "django.contrib.auth.hashers.Argon2PasswordHasher",
     "django.contrib.auth.hashers.ScryptPasswordHasher",
 ]
-
-# BCrypt Configuration
+PASSWORD_HASHER = env('PASSWORD_HASHER')
+if PASSWORD_HASHER not in ('bcrypt', 'argon2'):
+    raise ImproperlyConfigured(f"Unknown PASSWORD_HASHER: {PASSWORD_HASHER}")
+if PASSWORD_HASHER == 'argon2':
+    # Fail at startup rather than on every registration and login rehash
+    if importlib.util.find_spec('argon2') is None:
+        raise ImproperlyConfigured("PASSWORD_HASHER=argon2 needs the argon2-cffi package")
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(1))
+
+# Hashing Costs (changing them rehashes passwords on the next login)
 BCRYPT_ROUNDS = env('BCRYPT_ROUNDS')
+ARGON2_TIME_COST = env('ARGON2_TIME_COST')
+ARGON2_MEMORY_COST = env('ARGON2_MEMORY_COST')  # KiB
+ARGON2_PARALLELISM = env('ARGON2_PARALLELISM')
+
+# Authentication Backends
+AUTHENTICATION_BACKENDS = ['authentication.backends.BoundedModelBackend']
+AUTH_HASH_CONCURRENCY = env.int('AUTH_HASH_CONCURRENCY', default=os.cpu_count() or 2)  # password checks at once per process
+AUTH_HASH_WAIT = env('AUTH_HASH_WAIT')  # seconds a login waits for a hashing slot
 
 # Middleware Configuration
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'aamarpay_file_upload.middleware.MetricsMiddleware',
+    'aamarpay_file_upload.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -90,6 +181,10 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Response compression
+COMPRESSION_MIN_SIZE = env('COMPRESSION_MIN_SIZE')  # bytes, smaller bodies go out as they are
+COMPRESSION_BROTLI = env('COMPRESSION_BROTLI')  # brotli for API and export responses, needs the brotli package
+COMPRESSION_BROTLI_QUALITY = env('COMPRESSION_BROTLI_QUALITY')  # 0-11, higher is smaller and slower
 
 ROOT_URLCONF = 'aamarpay_file_upload.urls'
 
@@ -107,6 +202,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'uploads.context_processors.upload_formats',
             ],
         },
     },
@@ -115,16 +211,15 @@ TEMPLATES = [
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'authentication.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-    ],
+    ] + (['authentication.authentication.CachedJWTAuthentication'] if env('AUTH_JWT_ENABLED') else []),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
-    ],
+        'aamarpay_file_upload.renderers.ORJSONRenderer',
+    ] + (['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),  # no HTML API in production
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
         'rest_framework.parsers.FormParser',
@@ -142,6 +237,22 @@ REST_FRAMEWORK = {
     },
 }
 
+# API Token Authentication
+AUTH_TOKEN_CACHE_TTL = env('AUTH_TOKEN_CACHE_TTL')  # seconds a token's user stays in the shared cache
+AUTH_TOKEN_LOCAL_TTL = env('AUTH_TOKEN_LOCAL_TTL')  # seconds in the per-process LRU, bounds staleness after logout
+AUTH_TOKEN_LOCAL_SIZE = env('AUTH_TOKEN_LOCAL_SIZE')  # tokens kept per process
+AUTH_TOKEN_IDLE_TIMEOUT = env('AUTH_TOKEN_IDLE_TIMEOUT')  # seconds unused before a token expires (sliding)
+AUTH_TOKEN_MAX_AGE = env('AUTH_TOKEN_MAX_AGE')  # seconds, hard limit whatever the use
+AUTH_TOKEN_ROTATE_AFTER = env('AUTH_TOKEN_ROTATE_AFTER')  # seconds, logins get a new token once the newest is older
+AUTH_TOKEN_USAGE_FLUSH_INTERVAL = env('AUTH_TOKEN_USAGE_FLUSH_INTERVAL')  # seconds between batched last_used writes
+AUTH_TOKEN_USAGE_FLUSH_SIZE = env('AUTH_TOKEN_USAGE_FLUSH_SIZE')  # buffered tokens that force a flush
+AUTH_TOKEN_PURGE_BATCH_SIZE = env('AUTH_TOKEN_PURGE_BATCH_SIZE')  # expired tokens deleted per statement
+AUTH_JWT_ENABLED = env('AUTH_JWT_ENABLED')  # signed access tokens under /api/auth/jwt/, no token lookup at all
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(seconds=env('AUTH_JWT_ACCESS_LIFETIME')),  # not revoked by logout, keep short
+    'REFRESH_TOKEN_LIFETIME': timedelta(seconds=env('AUTH_JWT_REFRESH_LIFETIME')),
+}
+
 WSGI_APPLICATION = 'aamarpay_file_upload.wsgi.application'
 
 # Database Configuration
@@ -153,9 +264,41 @@ DATABASES = {
         "PASSWORD": env("POSTGRES_PASSWORD"),
         "HOST": env("POSTGRES_HOST"),
         "PORT": env("POSTGRES_PORT"),
+        "CONN_HEALTH_CHECKS": env("DB_CONN_HEALTH_CHECKS"),  # ping a reused connection before the request uses it
     }
 }
 
+# Database connections: persistent (one kept per thread), pool (psycopg_pool
+# per process, PostgreSQL only), pgbouncer (transaction pooling in front of
+# PostgreSQL) or none (connect on every request and task)
+DB_CONNECTION_MODE = env('DB_CONNECTION_MODE')
+if DB_CONNECTION_MODE not in ('persistent', 'pool', 'pgbouncer', 'none'):
+    raise ImproperlyConfigured(f"Unknown DB_CONNECTION_MODE: {DB_CONNECTION_MODE}")
+if DB_CONNECTION_MODE in ('pool', 'pgbouncer') and 'postgresql' not in DATABASES['default']['ENGINE']:
+    DB_CONNECTION_MODE = 'persistent'  # e.g. SQLite in development
+
+if DB_CONNECTION_MODE == 'pool':
+    # Sized per process: a gthread worker serves GUNICORN_THREADS requests at once,
+    # a prefork Celery child one task. The pool grows on demand up to max_size.
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': env('DB_POOL_MIN_SIZE'),
+            'max_size': env('DB_POOL_MAX_SIZE') or env.int('GUNICORN_THREADS', default=4),
+            'timeout': env('DB_POOL_TIMEOUT'),  # seconds a request waits for a free connection
+            'max_idle': env('DB_POOL_MAX_IDLE'),
+            'max_lifetime': env('DB_POOL_MAX_LIFETIME'),
+        },
+    }
+elif DB_CONNECTION_MODE == 'none':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = env('DB_CONN_MAX_AGE')  # seconds a thread keeps its connection
+
+if DB_CONNECTION_MODE == 'pgbouncer':
+    # Transaction pooling hands each transaction a different server connection,
+    # cursors held across transactions do not survive that
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
 # Password Validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -193,10 +336,7 @@ LOGOUT_REDIRECT_URL = '/'
 # Media Files Configuration
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-
-# Ensure media directory exists
-os.makedirs(MEDIA_ROOT, exist_ok=True)
-os.makedirs(os.path.join(MEDIA_ROOT, 'uploads'), exist_ok=True)
+# Directories under it are created by the storage on the first save
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -207,7 +347,77 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
-CELERY_BEAT_SCHEDULE = {}
+# Priority lanes on the Redis broker (0 is served first)
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+CELERY_TASK_DEFAULT_PRIORITY = 6
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_BEAT_SCHEDULE = {
+    'dispatch-pending-files': {
+        'task': 'uploads.tasks.dispatch_pending_files',
+        'schedule': timedelta(seconds=env('UPLOAD_DISPATCH_INTERVAL')),
+    },
+    'relay-processing-outbox': {
+        'task': 'uploads.tasks.relay_processing_outbox',
+        'schedule': timedelta(seconds=env('UPLOAD_DISPATCH_INTERVAL')),
+    },
+    'reap-stale-processing': {
+        'task': 'uploads.tasks.reap_stale_processing',
+        'schedule': timedelta(seconds=env('UPLOAD_REAPER_INTERVAL')),
+    },
+    'purge-pending-removals': {
+        'task': 'uploads.tasks.purge_pending_removals',
+        'schedule': timedelta(seconds=env('UPLOAD_PURGE_INTERVAL')),
+    },
+    'reconcile-storage': {
+        'task': 'uploads.tasks.reconcile_upload_storage',
+        'schedule': timedelta(seconds=env('UPLOAD_RECONCILE_INTERVAL')),
+    },
+    'purge-expired-tokens': {
+        'task': 'authentication.tasks.purge_expired_tokens',
+        'schedule': timedelta(seconds=env('AUTH_TOKEN_PURGE_INTERVAL')),
+    },
+}
+
+# Processing Scheduler Configuration
+UPLOAD_USER_CONCURRENCY = env('UPLOAD_USER_CONCURRENCY')  # files in flight per user
+UPLOAD_SMALL_FILE_SIZE = env('UPLOAD_SMALL_FILE_SIZE')  # bytes, small files get a faster lane
+UPLOAD_PAID_PRIORITY_WINDOW = env('UPLOAD_PAID_PRIORITY_WINDOW')  # seconds after a payment
+UPLOAD_SLOT_TIMEOUT = env('UPLOAD_SLOT_TIMEOUT')  # seconds before a leaked slot expires
+UPLOAD_DISPATCH_BATCH_SIZE = env('UPLOAD_DISPATCH_BATCH_SIZE')  # users served per dispatcher run
+UPLOAD_PROCESSING_MAX_RETRIES = env('UPLOAD_PROCESSING_MAX_RETRIES')  # retries for transient errors
+UPLOAD_RETRY_BACKOFF = env('UPLOAD_RETRY_BACKOFF')  # seconds, doubled on every retry
+UPLOAD_RETRY_BACKOFF_MAX = env('UPLOAD_RETRY_BACKOFF_MAX')  # seconds
+UPLOAD_OUTBOX_BATCH_SIZE = env('UPLOAD_OUTBOX_BATCH_SIZE')  # outbox entries relayed per transaction
+UPLOAD_STALE_HEARTBEAT_AFTER = env('UPLOAD_STALE_HEARTBEAT_AFTER')  # seconds without a worker heartbeat
+UPLOAD_HEARTBEAT_INTERVAL = env('UPLOAD_HEARTBEAT_INTERVAL')  # seconds between heartbeats while a file is read, keep well below the above
+UPLOAD_PROCESSING_TIME_LIMIT = env('UPLOAD_PROCESSING_TIME_LIMIT')  # seconds a single file may take before it fails
+UPLOAD_STALE_QUEUED_AFTER = env('UPLOAD_STALE_QUEUED_AFTER')  # seconds dispatched but never started
+UPLOAD_PROCESSING_MAX_ATTEMPTS = env('UPLOAD_PROCESSING_MAX_ATTEMPTS')  # worker starts before a stale file fails
+UPLOAD_REAPER_BATCH_SIZE = env('UPLOAD_REAPER_BATCH_SIZE')  # stale files handled per reaper run
+UPLOAD_LIGHT_QUEUE = env('UPLOAD_LIGHT_QUEUE')  # streaming formats (txt, md, csv, html)
+UPLOAD_HEAVY_QUEUE = env('UPLOAD_HEAVY_QUEUE')  # docx, odt and large in-memory documents
+UPLOAD_BATCH_TASK_SIZE = env('UPLOAD_BATCH_TASK_SIZE')  # bulk upload files processed per task
+UPLOAD_PURGE_BATCH_SIZE = env('UPLOAD_PURGE_BATCH_SIZE')  # stored files of deleted uploads removed per transaction
+
+# Storage Reconciliation Configuration
+UPLOAD_ORPHAN_ACTION = env('UPLOAD_ORPHAN_ACTION')  # 'report', 'quarantine' or 'delete' for files without a row
+UPLOAD_ORPHAN_GRACE_PERIOD = env('UPLOAD_ORPHAN_GRACE_PERIOD')  # seconds, younger files are never orphans
+UPLOAD_QUARANTINE_DIR = env('UPLOAD_QUARANTINE_DIR')  # under MEDIA_ROOT, outside the scanned uploads/ tree
+UPLOAD_RECONCILE_CHUNK_SIZE = env('UPLOAD_RECONCILE_CHUNK_SIZE')  # files compared per query
+
+# Content Search Configuration
+UPLOAD_SEARCH_ENABLED = env('UPLOAD_SEARCH_ENABLED')  # index file contents while counting words
+UPLOAD_SEARCH_BACKEND = env('UPLOAD_SEARCH_BACKEND')  # 'postgres' or 'inverted', empty picks by database
+UPLOAD_SEARCH_MAX_TERMS = env('UPLOAD_SEARCH_MAX_TERMS')  # distinct terms indexed per file
+
+# Text Statistics Configuration
+UPLOAD_STATS_TOP_TERMS = env('UPLOAD_STATS_TOP_TERMS')  # most frequent terms kept per file
+UPLOAD_STATS_EXACT_TERMS = env('UPLOAD_STATS_EXACT_TERMS')  # distinct terms counted exactly before estimating
+UPLOAD_STATS_READING_WPM = env('UPLOAD_STATS_READING_WPM')  # words per minute for reading time
 
 # aamarPay Configuration
 AAMARPAY_STORE_ID = env('AAMARPAY_STORE_ID')
@@ -217,13 +427,37 @@ AAMARPAY_SUCCESS_URL = env('AAMARPAY_SUCCESS_URL')
 AAMARPAY_FAIL_URL = env('AAMARPAY_FAIL_URL')
 AAMARPAY_CANCEL_URL = env('AAMARPAY_CANCEL_URL')
 
+# Metrics Configuration (bearer token required on /metrics, without one it answers 404 unless made public)
+METRICS_AUTH_TOKEN = env('METRICS_AUTH_TOKEN', default='')
+METRICS_PUBLIC = env('METRICS_PUBLIC')  # serve /metrics without a token, only on a private network
+
+# Query Budget Configuration
+QUERY_BUDGET_ENABLED = env('QUERY_BUDGET_ENABLED')
+QUERY_BUDGET = env('QUERY_BUDGET')  # queries per request before a warning is logged
+QUERY_BUDGET_OVERRIDES = {
+    # An upload writes the file, its activity and outbox rows, then relays and dispatches after commit
+    'upload_file': 25,
+    'uploads:api_upload_file': 25,
+    **env.dict('QUERY_BUDGET_OVERRIDES', cast={'value': int}, default={}),  # view_name=budget
+}
+QUERY_BUDGET_REPEAT_THRESHOLD = env('QUERY_BUDGET_REPEAT_THRESHOLD')  # same-shape queries flagged as N+1
+QUERY_BUDGET_HEADERS = env.bool('QUERY_BUDGET_HEADERS', default=DEBUG)  # X-DB-Query-Count/-Time headers
+
+# Admin Configuration (changelists above this many rows show PostgreSQL estimates)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = env('ADMIN_ESTIMATED_COUNT_THRESHOLD')
+
 # File Upload Configuration
 FILE_UPLOAD_MAX_MEMORY_SIZE = env('FILE_UPLOAD_MAX_SIZE')
 DATA_UPLOAD_MAX_MEMORY_SIZE = env('DATA_UPLOAD_MAX_SIZE')
-ALLOWED_FILE_EXTENSIONS = env.list('ALLOWED_FILE_EXTENSIONS', default=['.txt', '.docx'])
+UPLOAD_MAX_FILE_SIZE = env('FILE_UPLOAD_MAX_SIZE')  # bytes, larger uploads are stopped while streaming
+UPLOAD_BULK_MAX_FILES = env('UPLOAD_BULK_MAX_FILES')  # files per bulk upload, archive members included
+UPLOAD_BULK_MAX_SIZE = env('UPLOAD_BULK_MAX_SIZE')  # bytes per bulk upload request, and unpacked archive total
+ALLOWED_FILE_EXTENSIONS = env.list('ALLOWED_FILE_EXTENSIONS', default=[])  # narrows uploads.extractors, empty allows all
+EXPORT_CHUNK_SIZE = env('EXPORT_CHUNK_SIZE')  # rows fetched per round trip by /api/uploads/export/
 
 # File Upload Handlers
 FILE_UPLOAD_HANDLERS = [
+    'uploads.uploadhandlers.SniffingUploadHandler',  # size and content checks before anything is stored
     'django.core.files.uploadhandler.MemoryFileUploadHandler',
     'django.core.files.uploadhandler.TemporaryFileUploadHandler',
 ]
@@ -235,6 +469,7 @@ CACHES = {
         'TIMEOUT': env('CACHE_TIMEOUT'),
     }
 }
+PAGE_CACHE_TIMEOUT = env('PAGE_CACHE_TIMEOUT')  # seconds rendered fragments and page summaries stay cached per version
 
 # Logging Configuration
 LOGGING = {
@@ -279,6 +514,11 @@ LOGGING = {
             'level': env('LOG_LEVEL', default='DEBUG'),
             'propagate': True,
         },
+        'aamarpay_file_upload': {
+            'handlers': ['file', 'console'],
+            'level': env('LOG_LEVEL', default='DEBUG'),
+            'propagate': True,
+        },
     },
 }
 
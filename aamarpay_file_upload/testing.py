@@ -0,0 +1,55 @@
+from contextlib import contextmanager
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .middleware import query_shape
+
+# Query budgets for the hot endpoints, by URL name, with a cold page cache.
+# Session auth costs two of them (session and user), cached token auth none.
+HOT_ENDPOINT_BUDGETS = {
+    'dashboard': 4,
+    'file_list': 4,
+    'transaction_list': 4,
+    'upload_file': 3,
+    'uploads:api_list_files': 4,
+    'uploads:api_search_files': 4,
+    'uploads:api_list_activities': 4,
+    'payments:transaction_list': 4,
+    'payments:check_payment_status': 3,
+    'authentication:profile': 2,
+}
+
+
+@contextmanager
+def assert_query_budget(budget, repeat_threshold=None, using='default'):
+    """Fail when the block runs more than `budget` queries, or repeats one query shape"""
+    with CaptureQueriesContext(connections[using]) as context:
+        yield context
+
+    queries = [query['sql'] for query in context.captured_queries]
+    if len(queries) > budget:
+        listing = '\n'.join(f"{i}. {sql}" for i, sql in enumerate(queries, start=1))
+        raise AssertionError(f"{len(queries)} queries run, budget is {budget}:\n{listing}")
+
+    if repeat_threshold:
+        shapes = {}
+        for sql in queries:
+            shape = query_shape(sql)
+            shapes[shape] = shapes.get(shape, 0) + 1
+        repeated = {shape: count for shape, count in shapes.items() if count >= repeat_threshold}
+        if repeated:
+            listing = '\n'.join(f"{count} x {shape}" for shape, count in repeated.items())
+            raise AssertionError(f"Repeated queries (possible N+1):\n{listing}")
+
+
+class QueryBudgetTestMixin:
+    """TestCase mixin asserting the query budget of an endpoint"""
+
+    def assertQueryBudget(self, url_name, *args, method='get', budget=None, repeat_threshold=3, data=None, **extra):
+        if budget is None:
+            budget = HOT_ENDPOINT_BUDGETS[url_name]
+
+        url = reverse(url_name, args=args)
+        with assert_query_budget(budget, repeat_threshold=repeat_threshold):
+            response = getattr(self.client, method)(url, data=data, **extra)
+        return response
@@ -0,0 +1,88 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from payments.models import PaymentTransaction
+from uploads.models import FileUpload
+from .metrics import metrics_view
+from .middleware import BROTLI_AVAILABLE, CompressionMiddleware
+from .testing import QueryBudgetTestMixin
+import unittest
+
+
+class PageQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pass12345')
+        for i in range(3):
+            PaymentTransaction.objects.create(user=self.user, transaction_id=f'TXN{i}', status='completed')
+            FileUpload.objects.create(user=self.user, filename=f'notes{i}.txt', status='completed', word_count=10)
+        self.client.force_login(self.user)
+
+    def test_dashboard(self):
+        response = self.assertQueryBudget('dashboard')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['transaction_count'], 3)
+
+    def test_file_list(self):
+        response = self.assertQueryBudget('file_list')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_files'], 3)
+
+    def test_transaction_list(self):
+        response = self.assertQueryBudget('transaction_list')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_transactions'], 3)
+
+    def test_upload_file(self):
+        response = self.assertQueryBudget('upload_file')
+        self.assertEqual(response.status_code, 200)
+
+    def test_unchanged_dashboard_revalidates(self):
+        etag = self.client.get('/dashboard/')['ETag']
+        response = self.assertQueryBudget('dashboard', budget=2, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class MetricsViewTests(SimpleTestCase):
+    def scrape(self, **headers):
+        return metrics_view(RequestFactory().get('/metrics', **headers))
+
+    @override_settings(METRICS_AUTH_TOKEN='', METRICS_PUBLIC=False)
+    def test_hidden_without_token(self):
+        self.assertEqual(self.scrape().status_code, 404)
+
+    @override_settings(METRICS_AUTH_TOKEN='', METRICS_PUBLIC=True)
+    def test_public_opt_in(self):
+        self.assertEqual(self.scrape().status_code, 200)
+
+    @override_settings(METRICS_AUTH_TOKEN='secret', METRICS_PUBLIC=False)
+    def test_token_required(self):
+        self.assertEqual(self.scrape().status_code, 403)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100, COMPRESSION_BROTLI=True)
+@unittest.skipUnless(BROTLI_AVAILABLE, 'brotli is not installed')
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = b'{"token": "csrf-secret", "rows": [' + b'"row", ' * 200 + b'"row"]}'
+
+    def compress(self, content_type):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, br')
+        middleware = CompressionMiddleware(lambda request: HttpResponse(self.body, content_type=content_type))
+        return middleware(request)
+
+    def test_json_uses_brotli(self):
+        response = self.compress('application/json')
+        self.assertEqual(response['Content-Encoding'], 'br')
+
+    def test_csv_uses_brotli(self):
+        response = self.compress('text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Encoding'], 'br')
+
+    def test_html_stays_on_padded_gzip(self):
+        # Django pads gzip output with random bytes against BREACH, brotli has no equivalent
+        response = self.compress('text/html; charset=utf-8')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lengths = {len(self.compress('text/html; charset=utf-8').content) for _ in range(10)}
+        self.assertGreater(len(lengths), 1)
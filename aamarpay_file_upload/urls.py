@@ -4,6 +4,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.shortcuts import redirect
 from . import views
+from .metrics import metrics_view
 
 urlpatterns = [
     path('', views.home_view, name='home'),
@@ -30,6 +31,7 @@ urlpatterns = [
     path('api/auth/', include('authentication.urls')),
     
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 # Serve media files in development
@@ -0,0 +1,153 @@
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+import hashlib
+import time
+
+# What a user's pages are built from, each scope has its own version per user
+FILES = 'files'
+PAYMENTS = 'payments'
+ACCOUNT = 'account'
+
+
+def _version_key(scope, user_id):
+    return f'version:{scope}:{user_id}'
+
+
+def _now():
+    # Microseconds, a version doubles as the time of the last change
+    return time.time_ns() // 1000
+
+
+def get_versions(user_id, scopes):
+    """
+    Current version of each scope for a user. A missing version (cold or
+    evicted cache) starts at now, so nothing cached for an older one is reused.
+    """
+    keys = {scope: _version_key(scope, user_id) for scope in scopes}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for scope, key in keys.items():
+        if key not in found:
+            cache.add(key, _now(), None)
+            found[key] = cache.get(key) or _now()
+        versions[scope] = found[key]
+    return versions
+
+
+def bump_version(scope, user_ids):
+    """
+    Move a scope to a new version once the current transaction commits, a
+    page rendered before the commit can only be cached under the old one.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+    transaction.on_commit(
+        lambda: cache.set_many({_version_key(scope, user_id): _now() for user_id in user_ids}, None),
+        robust=True
+    )
+
+
+def versioned(name, user_id, version, compute):
+    """Value computed once per version, e.g. a page's status summary"""
+    return cache.get_or_set(f'page:{name}:{user_id}:{version}', compute, settings.PAGE_CACHE_TIMEOUT)
+
+
+def request_versions(request, scopes):
+    """Versions read once per request, the ETag and the rendered page agree"""
+    known = request.__dict__.setdefault('_page_versions', {})
+    missing = [scope for scope in scopes if scope not in known]
+    if missing:
+        known.update(get_versions(request.user.pk, missing))
+    return {scope: known[scope] for scope in scopes}
+
+
+def fragment_context(versions):
+    """Variables for {% cache page_cache_timeout <name> user.id <scope>_version %}"""
+    context = {f'{scope}_version': version for scope, version in versions.items()}
+    context['page_cache_timeout'] = settings.PAGE_CACHE_TIMEOUT
+    return context
+
+
+def _cacheable(request, page):
+    if not request.user.is_authenticated:
+        return False
+    # Flash messages are shown once, a 304 would hide them
+    return not (page and len(get_messages(request)))
+
+
+def _etag_func(scopes, page):
+    def etag(request, *args, **kwargs):
+        if not _cacheable(request, page):
+            return None
+        versions = request_versions(request, scopes)
+        parts = [request.get_full_path(), str(request.user.pk)]
+        if page:
+            # Forms on the page carry the CSRF secret, a rotated one needs a fresh render
+            parts.append(request.META.get('CSRF_COOKIE', ''))
+        else:
+            # JSON and the browsable API share a URL
+            parts.append(request.META.get('HTTP_ACCEPT', ''))
+        parts += [f'{scope}={versions[scope]}' for scope in scopes]
+        return hashlib.sha256('|'.join(parts).encode()).hexdigest()[:32]
+    return etag
+
+
+def _last_modified_func(scopes, page):
+    def last_modified(request, *args, **kwargs):
+        if not _cacheable(request, page):
+            return None
+        versions = request_versions(request, scopes)
+        return datetime.fromtimestamp(max(versions.values()) / 1_000_000, tz=dt_timezone.utc)
+    return last_modified
+
+
+def _conditional(scopes, page):
+    def decorator(view):
+        view = condition(etag_func=_etag_func(scopes, page), last_modified_func=_last_modified_func(scopes, page))(view)
+        # Clients keep the response but revalidate it, shared caches never store it
+        return cache_control(private=True, no_cache=True)(view)
+    return decorator
+
+
+def conditional_page(*scopes):
+    """
+    ETag and Last-Modified from the user's versions of `scopes`, a repeat
+    load of an unchanged page gets a 304 before the view runs.
+    """
+    return _conditional(scopes, page=True)
+
+
+def conditional_api(*scopes):
+    """
+    conditional_page for DRF function views. Goes below @api_view, so the
+    token user is known; a 304 skips the queries and the serializer.
+    """
+    return _conditional(scopes, page=False)
+
+
+@receiver(post_save, sender='uploads.FileUpload')
+@receiver(post_delete, sender='uploads.FileUpload')
+def bump_files_version(sender, instance, **kwargs):
+    # Uploads, processing results and deletes, bulk writes bump explicitly
+    bump_version(FILES, [instance.user_id])
+
+
+@receiver(post_save, sender='payments.PaymentTransaction')
+@receiver(post_delete, sender='payments.PaymentTransaction')
+def bump_payments_version(sender, instance, **kwargs):
+    bump_version(PAYMENTS, [instance.user_id])
+
+
+@receiver(post_save, sender=User)
+def bump_account_version(sender, instance, **kwargs):
+    # Names, flags and last login are shown on every page
+    bump_version(ACCOUNT, [instance.pk])
@@ -3,10 +3,16 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from payments.models import PaymentTransaction
+from . import metrics
+from .versioning import ACCOUNT, FILES, PAYMENTS, conditional_page, fragment_context, request_versions, versioned
 from uploads.models import FileUpload, ActivityLog
-from uploads.tasks import process_file_word_count
+from uploads.extractors import allowed_extensions, describe_extensions
+from uploads.outbox import enqueue_for_processing
+from uploads.scheduler import get_priority_lane
+from uploads.uploadhandlers import get_upload_rejection
+from authentication.backends import PasswordCheckBusy
 import os
 from uploads.models import FileUpload, ActivityLog
 from django.shortcuts import get_object_or_404
@@ -17,53 +23,55 @@ def home_view(request):
     return render(request, 'index.html')
 
 @login_required
+@conditional_page(ACCOUNT, PAYMENTS)
 def dashboard_view(request):
     """Dashboard page with MVT pattern"""
-    # Check if user has completed payment
-    has_payment = PaymentTransaction.objects.filter(
-        user=request.user,
-        status='completed'
-    ).exists()
-    
-    # Get user's recent transactions (limit to 5 for dashboard)
+    versions = request_versions(request, (ACCOUNT, PAYMENTS))
+    # Recent transactions, limit to 5 for dashboard
     transactions = PaymentTransaction.objects.filter(user=request.user).order_by('-timestamp')[:5]
-    
+
+    # Queried once per payments version. The count comes from the fetched rows,
+    # which the table fragment then renders without another query.
+    summary = versioned('dashboard', request.user.pk, versions[PAYMENTS], lambda: {
+        'has_payment': PaymentTransaction.objects.filter(user=request.user, status='completed').exists(),
+        'transaction_count': len(transactions),
+    })
+
     context = {
         'user': request.user,
-        'has_payment': has_payment,
         'transactions': transactions,
-        'transaction_count': transactions.count(),
+        **fragment_context(versions),
+        **summary,
     }
     return render(request, 'dashboard.html', context)
 
 @login_required
+@conditional_page(ACCOUNT, PAYMENTS)
 def transaction_list_view(request):
     """Full transaction list page"""
+    versions = request_versions(request, (ACCOUNT, PAYMENTS))
     transactions = PaymentTransaction.objects.filter(user=request.user).order_by('-timestamp')
     
     context = {
         'user': request.user,
         'transactions': transactions,
-        'total_transactions': transactions.count(),
-        'completed_transactions': transactions.filter(status='completed').count(),
-        'pending_transactions': transactions.filter(status='pending').count(),
-        'failed_transactions': transactions.filter(status='failed').count(),
+        **fragment_context(versions),
+        **versioned('transactions', request.user.pk, versions[PAYMENTS], transactions.status_summary),
     }
     return render(request, 'transactions.html', context)
 
 @login_required
+@conditional_page(ACCOUNT, FILES)
 def file_list_view(request):
     """File list page"""
+    versions = request_versions(request, (ACCOUNT, FILES))
     files = FileUpload.objects.filter(user=request.user)
     
     context = {
         'user': request.user,
         'files': files,
-        'total_files': files.count(),
-        'completed_files': files.filter(status='completed').count(),
-        'processing_files': files.filter(status='processing').count(),
-        'failed_files': files.filter(status='failed').count(),
-        'total_words': sum(f.word_count for f in files.filter(status='completed')),
+        **fragment_context(versions),
+        **versioned('files', request.user.pk, versions[FILES], files.status_summary),
     }
     return render(request, 'files.html', context)
 
@@ -88,17 +96,16 @@ def upload_file_view(request):
         uploaded_file = request.FILES.get('file')
         
         if not uploaded_file:
-            messages.error(request, 'Please select a file to upload.')
+            messages.error(request, get_upload_rejection(request) or 'Please select a file to upload.')
             return render(request, 'upload.html', {'has_payment': has_payment})
         
         print(f"File received: {uploaded_file.name}, Size: {uploaded_file.size}")
         
         # Validate file extension
-        allowed_extensions = ['.txt', '.docx']
         file_extension = os.path.splitext(uploaded_file.name)[1].lower()
         
-        if file_extension not in allowed_extensions:
-            messages.error(request, 'Only .txt and .docx files are allowed.')
+        if file_extension not in allowed_extensions():
+            messages.error(request, f'Only {describe_extensions()} files are allowed.')
             return render(request, 'upload.html', {'has_payment': has_payment})
         
         # Validate file size (10MB)
@@ -107,31 +114,33 @@ def upload_file_view(request):
             return render(request, 'upload.html', {'has_payment': has_payment})
         
         try:
-            # Create file upload record
-            file_upload = FileUpload.objects.create(
-                user=request.user,
-                file=uploaded_file,
-                filename=uploaded_file.name,
-                file_size=uploaded_file.size,
-                file_type=file_extension
-            )
+            with transaction.atomic():
+                # Create file upload record
+                file_upload = FileUpload.objects.create(
+                    user=request.user,
+                    file=uploaded_file,
+                    filename=uploaded_file.name,
+                    file_size=uploaded_file.size,
+                    file_type=file_extension,
+                    priority=get_priority_lane(request.user, uploaded_file.size)
+                )
             
-            print(f"FileUpload created: ID={file_upload.id}, Path={file_upload.file.path}")
+                print(f"FileUpload created: ID={file_upload.id}, Path={file_upload.file.path}")
+                metrics.UPLOAD_SIZE_BYTES.labels(file_type=file_upload.file_type).observe(file_upload.file_size)
             
-            # Log activity
-            ActivityLog.objects.create(
-                user=request.user,
-                action='file_uploaded',
-                metadata={
-                    'filename': file_upload.filename,
-                    'file_size': file_upload.file_size,
-                    'file_type': file_upload.file_type
-                }
-            )
+                # Log activity
+                ActivityLog.objects.create(
+                    user=request.user,
+                    action='file_uploaded',
+                    metadata={
+                        'filename': file_upload.filename,
+                        'file_size': file_upload.file_size,
+                        'file_type': file_upload.file_type
+                    }
+                )
             
-            # Trigger Celery task
-            task_result = process_file_word_count.delay(file_upload.id)
-            print(f"Celery task triggered: {task_result.id}")
+                # Queue word counting, relayed to Celery after commit
+                enqueue_for_processing(file_upload)
             
             messages.success(request, f'File "{uploaded_file.name}" uploaded successfully! Word count processing started.')
             return redirect('file_list')
@@ -185,7 +194,11 @@ def login_view(request):
         password = request.POST.get('password')
         
         if username and password:
-            user = authenticate(request, username=username, password=password)
+            try:
+                user = authenticate(request, username=username, password=password)
+            except PasswordCheckBusy:
+                messages.error(request, 'Too many logins right now, please try again in a moment.')
+                return render(request, 'login.html')
             if user:
                 login(request, user)
                 messages.success(request, f'Welcome back, {user.get_full_name() or user.username}!')
@@ -1,3 +1,16 @@
 from django.contrib import admin
+from aamarpay_file_upload.admin_utils import LargeTableAdmin
+from .models import APIToken
 
-# Register your models here.
+
+@admin.register(APIToken)
+class APITokenAdmin(LargeTableAdmin):
+    list_display = ['user', 'created', 'last_used']
+    list_select_related = ['user']
+    list_filter = ['created']
+    search_fields = ['user__username']
+    readonly_fields = ['key', 'user', 'created', 'last_used']
+
+    def has_add_permission(self, request):
+        # Tokens are issued at login
+        return False
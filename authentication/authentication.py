@@ -0,0 +1,175 @@
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from .models import APIToken, token_expires_at
+from .usage import usage_buffer
+import copy
+import hashlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+try:
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.settings import api_settings as jwt_settings
+    JWT_AVAILABLE = True
+except ImportError:
+    JWT_AVAILABLE = False
+
+
+class LocalLRUCache:
+    """Small per-process cache with a TTL, checked before the shared cache"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+# Other processes keep an entry for at most AUTH_TOKEN_LOCAL_TTL seconds after a logout
+_local_entries = LocalLRUCache(settings.AUTH_TOKEN_LOCAL_SIZE, settings.AUTH_TOKEN_LOCAL_TTL)
+
+
+def _token_cache_key(key):
+    # Raw tokens never go to the shared cache
+    return f'auth:token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def _user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate_token(key):
+    """Forget a token in this process and in the shared cache"""
+    cache_key = _token_cache_key(key)
+    _local_entries.delete(cache_key)
+    cache.delete(cache_key)
+
+
+def invalidate_user(user):
+    """Forget cached copies of a user, e.g. after it was deactivated"""
+    _local_entries.delete(_user_cache_key(user.pk))
+    keys = [_token_cache_key(key) for key in APIToken.objects.filter(user=user).values_list('key', flat=True)]
+    for key in keys:
+        _local_entries.delete(key)
+    cache.delete_many(keys + [_user_cache_key(user.pk)])
+
+
+def _load_token(key):
+    """(user, created, last_used) of a token, straight from the database"""
+    try:
+        token = APIToken.objects.select_related('user').get(key=key)
+    except APIToken.DoesNotExist:
+        raise exceptions.AuthenticationFailed(_('Invalid token.'))
+    return (token.user, token.created, token.last_used)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    APIToken authentication without the token/user query on every request:
+    the token is cached in process and in the shared cache for
+    AUTH_TOKEN_CACHE_TTL seconds. Deleting a token or saving a user drops
+    the entries. Uses only touch an in-memory buffer, see authentication.usage.
+    """
+    model = APIToken
+
+    def authenticate_credentials(self, key):
+        cache_key = _token_cache_key(key)
+        now = timezone.now()
+
+        entry = _local_entries.get(cache_key)
+        if entry is None:
+            entry = cache.get(cache_key)
+            if entry is None:
+                entry = _load_token(key)
+                cache.set(cache_key, entry, settings.AUTH_TOKEN_CACHE_TTL)
+            _local_entries.set(cache_key, entry)
+
+        user, created, last_used = entry
+        last_used = max(last_used, usage_buffer.get(key) or last_used)
+        if token_expires_at(created, last_used) <= now:
+            # Another process may have used it since the entry was cached
+            user, created, last_used = _load_token(key)
+            if token_expires_at(created, last_used) <= now:
+                invalidate_token(key)
+                raise exceptions.AuthenticationFailed(_('Token has expired.'))
+            entry = (user, created, last_used)
+            cache.set(cache_key, entry, settings.AUTH_TOKEN_CACHE_TTL)
+            _local_entries.set(cache_key, entry)
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        usage_buffer.touch(key, now)
+
+        # Requests get their own copy, views only use request.user and never the token object
+        return (copy.copy(user), key)
+
+
+if JWT_AVAILABLE:
+    class CachedJWTAuthentication(JWTAuthentication):
+        """Signed access tokens, users come from the same cache as token auth"""
+
+        def get_user(self, validated_token):
+            user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+            if user_id is None:
+                return super().get_user(validated_token)
+
+            cache_key = _user_cache_key(user_id)
+            user = _local_entries.get(cache_key) or cache.get(cache_key)
+            if user is None:
+                user = super().get_user(validated_token)
+                cache.set(cache_key, user, settings.AUTH_TOKEN_CACHE_TTL)
+            elif not user.is_active:
+                raise exceptions.AuthenticationFailed(_('User is inactive'), code='user_inactive')
+            _local_entries.set(cache_key, user)
+            return copy.copy(user)
+
+
+@receiver(post_delete, sender=APIToken)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    # logout_view, admin deletes and cascades from deleted users
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_saved_user(sender, instance, created, update_fields=None, **kwargs):
+    # Web logins only touch last_login, nothing the cached copy is checked for
+    if created or update_fields == frozenset({'last_login'}):
+        return
+    invalidate_user(instance)
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Password checks running at once in this process, bcrypt and argon2 release the GIL
+_hash_slots = threading.BoundedSemaphore(settings.AUTH_HASH_CONCURRENCY)
+
+
+class PasswordCheckBusy(Exception):
+    """Every password hashing slot stayed busy for AUTH_HASH_WAIT seconds"""
+
+
+class BoundedModelBackend(ModelBackend):
+    """
+    ModelBackend that caps concurrent password hashing per process. A login
+    burst then holds at most AUTH_HASH_CONCURRENCY worker threads, the rest
+    keep serving other requests; logins that cannot get a slot in time fail
+    fast with PasswordCheckBusy instead of queueing behind the burst.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if not _hash_slots.acquire(timeout=settings.AUTH_HASH_WAIT):
+            logger.warning("Password hashing slots exhausted, login rejected")
+            raise PasswordCheckBusy()
+        try:
+            return super().authenticate(request, username=username, password=password, **kwargs)
+        finally:
+            _hash_slots.release()
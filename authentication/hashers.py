@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, BCryptSHA256PasswordHasher
+
+
+class TunableBCryptSHA256PasswordHasher(BCryptSHA256PasswordHasher):
+    """
+    bcrypt_sha256 with the cost from BCRYPT_ROUNDS. Same algorithm name, so
+    stored hashes keep working and are rehashed on login when the cost changes.
+    """
+
+    @property
+    def rounds(self):
+        return settings.BCRYPT_ROUNDS
+
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    """argon2 with costs from settings, needs the argon2-cffi package"""
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
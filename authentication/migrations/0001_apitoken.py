@@ -0,0 +1,30 @@
+# Generated by Django 5.1 on 2026-10-19 11:51
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='APIToken',
+            fields=[
+                ('key', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_used', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='api_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-created'], name='apitoken_user_created_idx'), models.Index(fields=['created'], name='apitoken_created_idx'), models.Index(fields=['last_used'], name='apitoken_last_used_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+def copy_tokens(apps, schema_editor):
+    """Existing DRF tokens keep working, their idle window starts now"""
+    Token = apps.get_model('authtoken', 'Token')
+    APIToken = apps.get_model('authentication', 'APIToken')
+    now = timezone.now()
+    batch = []
+    for key, user_id in Token.objects.values_list('key', 'user_id').iterator(chunk_size=2000):
+        batch.append(APIToken(key=key, user_id=user_id, created=now, last_used=now))
+        if len(batch) >= 1000:
+            APIToken.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    APIToken.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_apitoken'),
+        ('authtoken', '0004_alter_tokenproxy_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_tokens, migrations.RunPython.noop),
+    ]
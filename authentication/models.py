@@ -1,3 +1,77 @@
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth.models import User
 from django.db import models
+from django.utils import timezone
+import binascii
+import os
 
-# Create your models here.
+
+def token_expires_at(created, last_used):
+    """Sliding expiry: idle timeout after the last use, capped by the maximum age"""
+    return min(
+        (last_used or created) + timedelta(seconds=settings.AUTH_TOKEN_IDLE_TIMEOUT),
+        created + timedelta(seconds=settings.AUTH_TOKEN_MAX_AGE)
+    )
+
+
+class APITokenQuerySet(models.QuerySet):
+    def issue(self, user):
+        """
+        Token for a login. The newest token is handed out again while it is
+        younger than AUTH_TOKEN_ROTATE_AFTER, so logins write nothing; older
+        tokens are rotated and expire on their own.
+        """
+        now = timezone.now()
+        token = (
+            self.filter(user=user, created__gt=now - timedelta(seconds=settings.AUTH_TOKEN_ROTATE_AFTER))
+            .order_by('-created')
+            .first()
+        )
+        if token is not None and not token.is_expired(now):
+            return token
+        return self.create(user=user)
+
+    def expired(self, now=None):
+        """Tokens past their idle timeout or their maximum age"""
+        now = now or timezone.now()
+        return self.filter(
+            models.Q(created__lt=now - timedelta(seconds=settings.AUTH_TOKEN_MAX_AGE)) |
+            models.Q(last_used__lt=now - timedelta(seconds=settings.AUTH_TOKEN_IDLE_TIMEOUT))
+        )
+
+
+class APIToken(models.Model):
+    """
+    API token with a sliding expiry, a user can hold one per device. last_used
+    is written in batches by authentication.usage, never on every request.
+    """
+    key = models.CharField(max_length=40, primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_tokens')
+    created = models.DateTimeField(default=timezone.now)
+    last_used = models.DateTimeField(default=timezone.now)
+
+    objects = APITokenQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Login reuses the newest token, the purge walks both expiry columns
+            models.Index(fields=['user', '-created'], name='apitoken_user_created_idx'),
+            models.Index(fields=['created'], name='apitoken_created_idx'),
+            models.Index(fields=['last_used'], name='apitoken_last_used_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.key[:8]}"
+
+    def save(self, *args, **kwargs):
+        if not self.key:
+            self.key = binascii.hexlify(os.urandom(20)).decode()
+        super().save(*args, **kwargs)
+
+    @property
+    def expires_at(self):
+        return token_expires_at(self.created, self.last_used)
+
+    def is_expired(self, now=None):
+        return self.expires_at <= (now or timezone.now())
@@ -1,6 +1,7 @@
-from rest_framework import serializers
+from rest_framework import exceptions, serializers
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
+from .backends import PasswordCheckBusy
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
@@ -34,7 +35,10 @@ class UserLoginSerializer(serializers.Serializer):
         password = attrs.get('password')
         
         if username and password:
-            user = authenticate(username=username, password=password)
+            try:
+                user = authenticate(username=username, password=password)
+            except PasswordCheckBusy:
+                raise exceptions.Throttled(wait=1, detail='Too many logins right now, try again in a moment.')
             if not user:
                 raise serializers.ValidationError('Invalid credentials.')
             if not user.is_active:
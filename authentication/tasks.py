@@ -0,0 +1,35 @@
+from celery import shared_task
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .models import APIToken
+from .usage import usage_buffer
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def purge_expired_tokens():
+    """
+    Periodic batch purge of API tokens past their idle timeout or maximum age
+    """
+    # Only this worker's buffer. Web processes write theirs within
+    # AUTH_TOKEN_USAGE_FLUSH_INTERVAL, so tokens are purged once they are
+    # expired by more than that; a use still buffered elsewhere is never missed.
+    usage_buffer.flush()
+    cutoff = timezone.now() - timedelta(seconds=2 * settings.AUTH_TOKEN_USAGE_FLUSH_INTERVAL)
+
+    batch_size = settings.AUTH_TOKEN_PURGE_BATCH_SIZE
+    purged = 0
+    while True:
+        keys = list(APIToken.objects.expired(cutoff).values_list('key', flat=True)[:batch_size])
+        if not keys:
+            break
+        purged += APIToken.objects.filter(key__in=keys).delete()[0]
+        if len(keys) < batch_size:
+            break
+
+    if purged:
+        logger.info(f"Purged {purged} expired API token(s)")
+    return purged
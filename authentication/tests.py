@@ -1,3 +1,58 @@
-from django.test import TestCase
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from unittest import mock
+from aamarpay_file_upload.testing import QueryBudgetTestMixin
+from .hashers import TunableArgon2PasswordHasher
+from .models import APIToken
+from .tasks import purge_expired_tokens
+from .usage import TokenUsageBuffer
+import importlib.util
+import unittest
 
-# Create your tests here.
+
+class ProfileQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pass12345')
+        self.client.force_login(self.user)
+
+    def test_profile(self):
+        response = self.assertQueryBudget('authentication:profile')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['username'], 'alice')
+
+
+@unittest.skipUnless(importlib.util.find_spec('argon2'), 'argon2-cffi is not installed')
+@override_settings(ARGON2_TIME_COST=1, ARGON2_MEMORY_COST=1024, ARGON2_PARALLELISM=1)
+class TunableArgon2PasswordHasherTests(SimpleTestCase):
+    def test_costs_from_settings(self):
+        hasher = TunableArgon2PasswordHasher()
+        encoded = hasher.encode('pass12345', hasher.salt())
+        self.assertTrue(hasher.verify('pass12345', encoded))
+        self.assertFalse(hasher.must_update(encoded))
+        with self.settings(ARGON2_TIME_COST=2):
+            self.assertTrue(hasher.must_update(encoded))
+
+
+class TokenUsageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pass12345')
+
+    @mock.patch('authentication.usage.threading.Thread')
+    def test_touch_starts_one_background_flusher(self, thread):
+        buffer = TokenUsageBuffer()
+        buffer.touch('a', timezone.now())
+        buffer.touch('b', timezone.now())
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once()
+
+    @override_settings(AUTH_TOKEN_IDLE_TIMEOUT=3600, AUTH_TOKEN_USAGE_FLUSH_INTERVAL=60)
+    def test_purge_spares_uses_other_processes_may_still_buffer(self):
+        now = timezone.now()
+        recent = APIToken.objects.create(user=self.user, last_used=now - timedelta(seconds=3600 + 30))
+        idle = APIToken.objects.create(user=self.user, last_used=now - timedelta(seconds=3600 + 300))
+
+        self.assertEqual(purge_expired_tokens(), 1)
+        self.assertTrue(APIToken.objects.filter(key=recent.key).exists())
+        self.assertFalse(APIToken.objects.filter(key=idle.key).exists())
@@ -1,4 +1,5 @@
 from django.urls import path
+from django.conf import settings
 from . import views
 
 app_name = 'authentication'
@@ -9,4 +10,12 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('profile/', views.profile_view, name='profile'),
     path('payment-status/', views.check_payment_status, name='payment_status'),
-]
\ No newline at end of file
+]
+
+if settings.AUTH_JWT_ENABLED:
+    from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+
+    urlpatterns += [
+        path('jwt/', TokenObtainPairView.as_view(), name='jwt_obtain'),
+        path('jwt/refresh/', TokenRefreshView.as_view(), name='jwt_refresh'),
+    ]
@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.db.models.functions import Greatest
+from .models import APIToken
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TokenUsageBuffer:
+    """
+    Last-use times of tokens seen by this process. Requests only record them
+    in memory, they reach the database in one UPDATE every
+    AUTH_TOKEN_USAGE_FLUSH_INTERVAL seconds or AUTH_TOKEN_USAGE_FLUSH_SIZE tokens.
+    A background thread flushes on the interval when no request comes to do it.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+        self.flusher_pid = None
+
+    def get(self, key):
+        return self.pending.get(key)
+
+    def touch(self, key, now):
+        with self.lock:
+            self.pending[key] = now
+            due = (
+                len(self.pending) >= settings.AUTH_TOKEN_USAGE_FLUSH_SIZE or
+                time.monotonic() - self.last_flush >= settings.AUTH_TOKEN_USAGE_FLUSH_INTERVAL
+            )
+            # Threads do not survive a fork, each process starts its own
+            start_flusher = self.flusher_pid != os.getpid()
+            if start_flusher:
+                self.flusher_pid = os.getpid()
+        if start_flusher:
+            threading.Thread(target=self.flush_periodically, name='token-usage-flush', daemon=True).start()
+        if due:
+            self.flush()
+
+    def flush_periodically(self):
+        """Flush loop of the background thread, an idle process still writes its last uses"""
+        while True:
+            time.sleep(settings.AUTH_TOKEN_USAGE_FLUSH_INTERVAL)
+            if time.monotonic() - self.last_flush < settings.AUTH_TOKEN_USAGE_FLUSH_INTERVAL or not self.pending:
+                continue
+            self.flush()
+            # The thread's own connection, not held between flushes
+            connection.close()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        try:
+            # Greatest() keeps the newest time when several processes flush the same token
+            return APIToken.objects.filter(key__in=list(pending)).update(
+                last_used=Greatest(
+                    F('last_used'),
+                    Case(
+                        *[When(key=key, then=Value(used)) for key, used in pending.items()],
+                        output_field=DateTimeField()
+                    )
+                )
+            )
+        except Exception as e:
+            logger.error(f"Error flushing token usage for {len(pending)} token(s): {str(e)}")
+            # Keep the times for the next flush unless newer ones came in
+            with self.lock:
+                for key, used in pending.items():
+                    self.pending.setdefault(key, used)
+            return 0
+
+
+usage_buffer = TokenUsageBuffer()
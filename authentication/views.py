@@ -2,7 +2,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.authtoken.models import Token
+from .models import APIToken
 from django.contrib.auth.models import User
 from .serializers import UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer
 
@@ -15,7 +15,7 @@ def register_view(request):
     serializer = UserRegistrationSerializer(data=request.data)
     if serializer.is_valid():
         user = serializer.save()
-        token, created = Token.objects.get_or_create(user=user)
+        token = APIToken.objects.issue(user)
         
         return Response({
             'message': 'User registered successfully',
@@ -40,7 +40,7 @@ def login_view(request):
     serializer = UserLoginSerializer(data=request.data)
     if serializer.is_valid():
         user = serializer.validated_data['user']
-        token, created = Token.objects.get_or_create(user=user)
+        token = APIToken.objects.issue(user)
         
         return Response({
             'message': 'Login successful',
@@ -63,7 +63,11 @@ def logout_view(request):
     Logout user by deleting token
     """
     try:
-        request.user.auth_token.delete()
+        # The token of this request, every token of the user for session logins
+        tokens = APIToken.objects.filter(user=request.user)
+        if isinstance(request.auth, str):
+            tokens = tokens.filter(key=request.auth)
+        tokens.delete()
         return Response({
             'message': 'Logout successful'
         }, status=status.HTTP_200_OK)
@@ -0,0 +1,42 @@
+# Gunicorn configuration, picked up automatically from the working directory
+import os
+
+bind = '0.0.0.0:8000'
+workers = int(os.environ.get('GUNICORN_WORKERS', 3))
+# Threads keep a worker serving requests while password hashes (which release the GIL) run
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+# Import Django once in the master, workers fork with it loaded and share the pages
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+
+def on_starting(server):
+    # Start every deploy with a clean Prometheus multiprocess directory
+    from aamarpay_file_upload.metrics import clear_multiprocess_dir
+    clear_multiprocess_dir()
+
+
+def when_ready(server):
+    if preload_app:
+        # Views and serializers too, not on the first request of every worker
+        from django.urls import get_resolver
+        get_resolver().url_patterns
+
+
+def pre_fork(server, worker):
+    # A connection or pool opened while preloading must not be shared by the workers
+    if preload_app:
+        from aamarpay_file_upload.db import close_connections
+        close_connections()
+
+
+def child_exit(server, worker):
+    from aamarpay_file_upload.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
+
+
+def worker_exit(server, worker):
+    # Token uses still buffered in this worker, see authentication.usage
+    from authentication.usage import usage_buffer
+    usage_buffer.flush()
@@ -0,0 +1,235 @@
+"""
+Load driver for the payment-to-upload flow. Every virtual user runs
+register -> login -> initiate -> callback -> upload -> poll against a
+running stack (gunicorn + Celery, gateway pointed at loadtest.fake_gateway):
+
+    python -m loadtest.driver --base-url http://localhost:8000 --users 200 --concurrency 20
+"""
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+import argparse
+import json
+import random
+import string
+import time
+import uuid
+
+import requests
+
+STEPS = ['register', 'login', 'initiate', 'callback', 'upload', 'poll']
+
+
+class StepFailed(Exception):
+    pass
+
+
+class Recorder:
+    """Collects per-step latencies from all virtual users"""
+
+    def __init__(self):
+        self.samples = {step: [] for step in STEPS}
+        self.errors = {step: 0 for step in STEPS}
+        self.flows = 0
+        self.lock = Lock()
+
+    def record(self, step, seconds, ok):
+        with self.lock:
+            if ok:
+                self.samples[step].append(seconds)
+            else:
+                self.errors[step] += 1
+
+    def flow_completed(self):
+        with self.lock:
+            self.flows += 1
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+class VirtualUser:
+    def __init__(self, options, recorder, number):
+        self.options = options
+        self.recorder = recorder
+        self.session = requests.Session()
+        suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
+        self.username = f"load_{number}_{suffix}"
+        self.password = 'LoadTest!2345'
+
+    def url(self, path):
+        return self.options.base_url.rstrip('/') + path
+
+    def step(self, name, func):
+        start = time.perf_counter()
+        try:
+            result = func()
+        except (requests.RequestException, StepFailed, KeyError, ValueError) as e:
+            self.recorder.record(name, time.perf_counter() - start, False)
+            raise StepFailed(f"{name}: {e}")
+        self.recorder.record(name, time.perf_counter() - start, True)
+        return result
+
+    def expect(self, response, *codes):
+        if response.status_code not in codes:
+            raise StepFailed(f"HTTP {response.status_code} {response.text[:200]}")
+        return response
+
+    def register(self):
+        response = self.session.post(self.url('/api/auth/register/'), json={
+            'username': self.username,
+            'email': f"{self.username}@example.com",
+            'password': self.password,
+            'password_confirm': self.password,
+        }, timeout=self.options.timeout)
+        self.expect(response, 201)
+
+    def login(self):
+        response = self.session.post(self.url('/api/auth/login/'), json={
+            'username': self.username,
+            'password': self.password,
+        }, timeout=self.options.timeout)
+        token = self.expect(response, 200).json()['token']
+        self.session.headers['Authorization'] = f"Token {token}"
+
+    def initiate(self):
+        response = self.session.post(
+            self.url('/api/payments/initiate-payment/'),
+            json={'amount': '100.00'},
+            timeout=self.options.timeout
+        )
+        data = self.expect(response, 200).json()
+        if not data.get('success'):
+            raise StepFailed(data.get('message', 'payment not initiated'))
+        return data['transaction_id']
+
+    def callback(self, transaction_id):
+        # What aamarPay posts to the success URL once the customer has paid
+        response = requests.post(self.url('/api/payments/payment/success/'), data={
+            'mer_txnid': transaction_id,
+            'pg_txnid': f"PG{uuid.uuid4().hex[:12].upper()}",
+            'status_code': '2',
+            'pay_status': 'Successful',
+            'amount': '100.00',
+        }, allow_redirects=False, timeout=self.options.timeout)
+        self.expect(response, 302)
+        if 'payment=success' not in response.headers.get('Location', ''):
+            raise StepFailed(f"callback redirected to {response.headers.get('Location')}")
+
+    def upload(self):
+        words = ' '.join(random.choices(['lorem', 'ipsum', 'dolor', 'sit', 'amet'], k=self.options.file_words))
+        response = self.session.post(
+            self.url('/api/uploads/upload/'),
+            files={'file': (f"{self.username}.txt", words.encode(), 'text/plain')},
+            timeout=self.options.timeout
+        )
+        return self.expect(response, 201).json()['file_id']
+
+    def poll(self, file_id):
+        # Time from accepted upload until the word count is available
+        deadline = time.monotonic() + self.options.poll_timeout
+        while time.monotonic() < deadline:
+            response = self.session.get(self.url('/api/uploads/files/'), timeout=self.options.timeout)
+            files = self.expect(response, 200).json()['files']
+            for file in files:
+                if file['id'] != file_id:
+                    continue
+                if file['status'] == 'completed':
+                    return
+                if file['status'] == 'failed':
+                    raise StepFailed(f"file {file_id} failed")
+            time.sleep(self.options.poll_interval)
+        raise StepFailed(f"file {file_id} not processed after {self.options.poll_timeout}s")
+
+    def run(self):
+        try:
+            self.step('register', self.register)
+            self.step('login', self.login)
+            transaction_id = self.step('initiate', self.initiate)
+            self.step('callback', lambda: self.callback(transaction_id))
+            file_id = self.step('upload', self.upload)
+            self.step('poll', lambda: self.poll(file_id))
+        except StepFailed as e:
+            if self.options.verbose:
+                print(f"{self.username}: {e}")
+            return
+        finally:
+            self.session.close()
+        self.recorder.flow_completed()
+
+
+def build_report(recorder, options, elapsed):
+    steps = {}
+    for step in STEPS:
+        values = sorted(recorder.samples[step])
+        steps[step] = {
+            'ok': len(values),
+            'errors': recorder.errors[step],
+            'throughput': round(len(values) / elapsed, 2) if elapsed else None,
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'p99': percentile(values, 99),
+            'max': values[-1] if values else None,
+        }
+        for key in ('p50', 'p95', 'p99', 'max'):
+            if steps[step][key] is not None:
+                steps[step][key] = round(steps[step][key], 4)
+
+    return {
+        'base_url': options.base_url,
+        'users': options.users,
+        'concurrency': options.concurrency,
+        'elapsed_seconds': round(elapsed, 2),
+        'flows_completed': recorder.flows,
+        'flows_per_second': round(recorder.flows / elapsed, 2) if elapsed else None,
+        'steps': steps,
+    }
+
+
+def print_report(report):
+    print(
+        f"{report['flows_completed']}/{report['users']} flows in {report['elapsed_seconds']}s "
+        f"({report['flows_per_second']} flows/s, concurrency {report['concurrency']})"
+    )
+    print(f"{'step':<10} {'ok':>6} {'err':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for step, row in report['steps'].items():
+        cells = [f"{row[key]:>8.3f}" if row[key] is not None else f"{'-':>8}" for key in ('p50', 'p95', 'p99', 'max')]
+        print(f"{step:<10} {row['ok']:>6} {row['errors']:>5} {row['throughput']:>8} {' '.join(cells)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Drive the payment-to-upload flow under load')
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--users', type=int, default=50, help='Number of flows to run')
+    parser.add_argument('--concurrency', type=int, default=10, help='Flows running at once')
+    parser.add_argument('--ramp-up', type=float, default=0.0, help='Seconds over which users are started')
+    parser.add_argument('--file-words', type=int, default=2000, help='Words in each uploaded file')
+    parser.add_argument('--poll-interval', type=float, default=0.5)
+    parser.add_argument('--poll-timeout', type=float, default=120.0)
+    parser.add_argument('--timeout', type=float, default=30.0, help='Per request timeout')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--verbose', action='store_true')
+    options = parser.parse_args(argv)
+
+    recorder = Recorder()
+    delay = options.ramp_up / options.users if options.users else 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=options.concurrency) as executor:
+        for number in range(options.users):
+            executor.submit(VirtualUser(options, recorder, number).run)
+            if delay:
+                time.sleep(delay)
+    elapsed = time.perf_counter() - start
+
+    report = build_report(recorder, options, elapsed)
+    print_report(report)
+    if options.output:
+        with open(options.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
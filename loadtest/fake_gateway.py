@@ -0,0 +1,107 @@
+"""
+Local stand-in for the aamarPay sandbox, for load tests. Point
+AAMARPAY_SANDBOX_URL at it:
+
+    python -m loadtest.fake_gateway --port 8010 --latency 0.3 --failure-rate 0.05
+    AAMARPAY_SANDBOX_URL=http://localhost:8010/jsonpost.php
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+
+
+class GatewayHandler(BaseHTTPRequestHandler):
+    """Answers jsonpost.php like the sandbox, with configurable latency and failures"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        options = self.server.options
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            payload = {}
+
+        # Simulated gateway latency
+        delay = options.latency + random.uniform(0, options.jitter)
+        if delay:
+            time.sleep(delay)
+
+        roll = random.random()
+        if roll < options.error_rate:
+            self.server.count('error')
+            self.send_json(503, {'result': 'false', 'error': 'Service temporarily unavailable'})
+        elif roll < options.error_rate + options.failure_rate:
+            self.server.count('rejected')
+            self.send_json(200, {'result': 'false', 'error': 'Transaction rejected'})
+        else:
+            self.server.count('success')
+            tran_id = payload.get('tran_id', '')
+            self.send_json(200, {
+                'result': 'true',
+                'payment_url': f"http://{self.headers.get('Host')}/paynow/{tran_id}?token={uuid.uuid4().hex}",
+            })
+
+    def do_GET(self):
+        # Health check and counters
+        self.send_json(200, dict(self.server.counters))
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.options.verbose:
+            super().log_message(format, *args)
+
+
+class GatewayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, options):
+        super().__init__(address, GatewayHandler)
+        self.options = options
+        self.counters = {'success': 0, 'rejected': 0, 'error': 0}
+        self.lock = threading.Lock()
+
+    def count(self, outcome):
+        with self.lock:
+            self.counters[outcome] += 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fake aamarPay gateway for load tests')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8010)
+    parser.add_argument('--latency', type=float, default=0.2, help='Base response time in seconds')
+    parser.add_argument('--jitter', type=float, default=0.1, help='Extra random latency in seconds')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of rejected payments')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of 503 responses')
+    parser.add_argument('--seed', type=int, help='Seed for reproducible failures')
+    parser.add_argument('--verbose', action='store_true')
+    options = parser.parse_args(argv)
+
+    if options.seed is not None:
+        random.seed(options.seed)
+
+    server = GatewayServer((options.host, options.port), options)
+    print(f"Fake aamarPay gateway on http://{options.host}:{options.port}/jsonpost.php")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served: {server.counters}")
+
+
+if __name__ == '__main__':
+    main()
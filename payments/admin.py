@@ -1,9 +1,11 @@
 from django.contrib import admin
+from aamarpay_file_upload.admin_utils import LargeTableAdmin
 from .models import PaymentTransaction
 
 @admin.register(PaymentTransaction)
-class PaymentTransactionAdmin(admin.ModelAdmin):
+class PaymentTransactionAdmin(LargeTableAdmin):
     list_display = ['transaction_id', 'user', 'amount', 'status', 'timestamp']
+    list_select_related = ['user']
     list_filter = ['status', 'timestamp']
     search_fields = ['transaction_id', 'user__username', 'user__email']
     readonly_fields = ['transaction_id', 'timestamp', 'gateway_response']
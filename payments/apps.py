@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PaymentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'payments'
+
+    def ready(self):
+        # Bumps the per-user page versions on payment changes
+        from aamarpay_file_upload import versioning  # noqa: F401
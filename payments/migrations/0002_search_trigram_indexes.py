@@ -0,0 +1,34 @@
+from django.db import migrations
+
+# Trigram index for admin searches on transaction_id, see
+# uploads/migrations/0008_search_trigram_indexes.py. PostgreSQL only.
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS payments_transaction_id_trgm '
+        'ON payments_paymenttransaction USING gin ((UPPER(transaction_id::text)) gin_trgm_ops)'
+    )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('DROP INDEX CONCURRENTLY IF EXISTS payments_transaction_id_trgm')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -2,6 +2,18 @@ from django.db import models
 from django.contrib.auth.models import User
 from decimal import Decimal
 
+
+class PaymentTransactionQuerySet(models.QuerySet):
+    def status_summary(self):
+        """Transaction counts per status in one query"""
+        return self.aggregate(
+            total_transactions=models.Count('id'),
+            completed_transactions=models.Count('id', filter=models.Q(status='completed')),
+            pending_transactions=models.Count('id', filter=models.Q(status='pending')),
+            failed_transactions=models.Count('id', filter=models.Q(status='failed')),
+        )
+
+
 class PaymentTransaction(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -20,6 +32,8 @@ class PaymentTransaction(models.Model):
     # aamarPay specific fields
     aamarpay_tran_id = models.CharField(max_length=100, blank=True, null=True)
     currency = models.CharField(max_length=3, default='BDT')
+
+    objects = PaymentTransactionQuerySet.as_manager()
     
     class Meta:
         ordering = ['-timestamp']
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from aamarpay_file_upload.serializers import ValuesListSerializer, format_datetime
 from .models import PaymentTransaction
 from django.contrib.auth.models import User
 
@@ -11,6 +12,11 @@ class PaymentInitiateSerializer(serializers.Serializer):
         return value
 
 class PaymentTransactionSerializer(serializers.ModelSerializer):
+    values_fields = [
+        'id', 'transaction_id', 'amount', 'status',
+        'timestamp', 'currency', 'aamarpay_tran_id'
+    ]
+
     class Meta:
         model = PaymentTransaction
         fields = [
@@ -18,6 +24,13 @@ class PaymentTransactionSerializer(serializers.ModelSerializer):
             'timestamp', 'currency', 'aamarpay_tran_id'
         ]
         read_only_fields = ['id', 'timestamp']
+        list_serializer_class = ValuesListSerializer
+
+    def represent_row(self, row, tz):
+        # DecimalField output: a string with the model's decimal places
+        row['amount'] = f"{row['amount']:.2f}"
+        row['timestamp'] = format_datetime(row['timestamp'], tz)
+        return row
 
 class PaymentCallbackSerializer(serializers.Serializer):
     """Serializer for aamarPay callback data"""
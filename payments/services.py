@@ -4,8 +4,10 @@ import uuid
 from datetime import datetime
 from django.conf import settings
 from django.contrib.auth.models import User
+from aamarpay_file_upload import metrics
 from .models import PaymentTransaction
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -67,6 +69,7 @@ class AamarPayService:
             
             logger.info(f"Initiating payment for user {user.username}, transaction {transaction_id}")
             
+            start = time.perf_counter()
             response = requests.post(
                 self.sandbox_url,
                 headers=headers,
@@ -75,6 +78,9 @@ class AamarPayService:
             )
             
             response_data = response.json()
+            metrics.GATEWAY_SECONDS.labels(
+                outcome='success' if response_data.get('result') == 'true' else 'rejected'
+            ).observe(time.perf_counter() - start)
             
             # Update transaction with gateway response
             payment_transaction.gateway_response = response_data
@@ -100,6 +106,7 @@ class AamarPayService:
                 }
                 
         except requests.exceptions.RequestException as e:
+            metrics.GATEWAY_SECONDS.labels(outcome='error').observe(time.perf_counter() - start)
             logger.error(f"Payment initiation failed: {str(e)}")
             payment_transaction.status = 'failed'
             payment_transaction.gateway_response = {'error': str(e)}
@@ -115,6 +122,14 @@ class AamarPayService:
         """
         Handle aamarPay callback after payment
         """
+        start = time.perf_counter()
+        result = self._process_payment_callback(callback_data)
+
+        outcome = result['transaction'].status if result['success'] else 'error'
+        metrics.CALLBACK_SECONDS.labels(outcome=outcome).observe(time.perf_counter() - start)
+        return result
+
+    def _process_payment_callback(self, callback_data):
         try:
             transaction_id = callback_data.get('mer_txnid')
             status_code = callback_data.get('status_code')
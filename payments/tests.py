@@ -1,3 +1,20 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from aamarpay_file_upload.testing import QueryBudgetTestMixin
+from .models import PaymentTransaction
 
-# Create your tests here.
+
+class PaymentAPIQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pass12345')
+        for i in range(3):
+            PaymentTransaction.objects.create(user=self.user, transaction_id=f'TXN{i}', status='completed')
+        self.client.force_login(self.user)
+
+    def test_transaction_list(self):
+        response = self.assertQueryBudget('payments:transaction_list')
+        self.assertEqual(response.status_code, 200)
+
+    def test_check_payment_status(self):
+        response = self.assertQueryBudget('payments:check_payment_status')
+        self.assertEqual(response.status_code, 200)
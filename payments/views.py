@@ -10,6 +10,8 @@ from django.views import View
 import json
 import logging
 
+from aamarpay_file_upload.versioning import ACCOUNT, PAYMENTS, conditional_api
+
 from .models import PaymentTransaction
 from .serializers import (
     PaymentInitiateSerializer, 
@@ -168,6 +170,7 @@ class PaymentCancelView(View):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_api(PAYMENTS)
 def transaction_list(request):
     """
     GET /api/payments/transactions/
@@ -183,6 +186,7 @@ def transaction_list(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_api(ACCOUNT, PAYMENTS)
 def check_payment_status(request):
     """
     GET /api/payments/check-status/
@@ -1,9 +1,11 @@
 from django.contrib import admin
-from .models import FileUpload, ActivityLog
+from aamarpay_file_upload.admin_utils import LargeTableAdmin
+from .models import FileUpload, ActivityLog, ProcessingDeadLetter, PendingFileRemoval
 
 @admin.register(FileUpload)
-class FileUploadAdmin(admin.ModelAdmin):
+class FileUploadAdmin(LargeTableAdmin):
     list_display = ['filename', 'user', 'status', 'word_count', 'upload_time']
+    list_select_related = ['user']
     list_filter = ['status', 'upload_time']
     search_fields = ['filename', 'user__username']
     readonly_fields = ['upload_time', 'word_count']
@@ -13,8 +15,9 @@ class FileUploadAdmin(admin.ModelAdmin):
         return False
 
 @admin.register(ActivityLog)
-class ActivityLogAdmin(admin.ModelAdmin):
+class ActivityLogAdmin(LargeTableAdmin):
     list_display = ['action', 'user', 'timestamp']
+    list_select_related = ['user']
     list_filter = ['action', 'timestamp']
     search_fields = ['action', 'user__username']
     readonly_fields = ['timestamp', 'metadata']
@@ -25,4 +28,26 @@ class ActivityLogAdmin(admin.ModelAdmin):
     
     def has_change_permission(self, request, obj=None):
         # Staff can only view activity logs
-        return False
\ No newline at end of file
+        return False
+
+@admin.register(ProcessingDeadLetter)
+class ProcessingDeadLetterAdmin(LargeTableAdmin):
+    list_display = ['file_upload', 'attempts', 'created_at', 'replayed_at']
+    list_select_related = ['file_upload__user']
+    list_filter = ['created_at', 'replayed_at']
+    readonly_fields = ['file_upload', 'task_id', 'error', 'traceback', 'attempts', 'created_at', 'replayed_at']
+
+    def has_change_permission(self, request, obj=None):
+        # Replay through the replay_dead_letters command
+        return False
+
+@admin.register(PendingFileRemoval)
+class PendingFileRemovalAdmin(LargeTableAdmin):
+    list_display = ['name', 'attempts', 'created_at']
+    list_filter = ['created_at']
+    search_fields = ['name']
+    readonly_fields = ['name', 'attempts', 'last_error', 'created_at']
+
+    def has_change_permission(self, request, obj=None):
+        # Rows are cleared by the purge task
+        return False
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class UploadsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'uploads'
+
+    def ready(self):
+        # Queues stored files of deleted uploads for removal
+        from . import cleanup  # noqa: F401
+        # Bumps the per-user page versions on file changes
+        from aamarpay_file_upload import versioning  # noqa: F401
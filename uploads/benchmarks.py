@@ -0,0 +1,285 @@
+from faker import Faker
+from multiprocessing import get_context
+from queue import Empty
+from statistics import median
+import os
+import platform
+import random
+import resource
+import subprocess
+import time
+import traceback
+
+# Locales and encodings of the generated .txt corpora
+TEXT_KINDS = {
+    'ascii': ('en_US', 'ascii'),
+    'bengali': ('bn_BD', 'utf-8'),
+    'latin1': ('fr_FR', 'latin-1'),
+    'long_lines': ('en_US', 'utf-8'),
+    'one_line': ('en_US', 'utf-8'),
+}
+DOCX_KINDS = ['paragraphs', 'tables', 'merged_cells']
+
+DEFAULT_SIZES = ['1KB', '100KB', '1MB', '10MB']
+LONG_LINE_LENGTH = 64 * 1024
+SENTENCE_POOL_SIZE = 2000
+
+UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+# Seconds a single run may take before its child process is killed
+DEFAULT_TIMEOUT = 600
+
+
+class BenchmarkError(Exception):
+    """A benchmark run raised, died or timed out"""
+
+
+def parse_size(value):
+    """Turn '10MB' into bytes"""
+    value = value.strip().upper()
+    for unit in sorted(UNITS, key=len, reverse=True):
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * UNITS[unit])
+    return int(value)
+
+
+def format_size(size):
+    for unit in ['GB', 'MB', 'KB']:
+        if size >= UNITS[unit] and size % UNITS[unit] == 0:
+            return f"{size // UNITS[unit]}{unit}"
+    return f"{size}B"
+
+
+def _sentence_pool(locale, seed):
+    fake = Faker(locale)
+    fake.seed_instance(seed)
+    pool = []
+    for i in range(SENTENCE_POOL_SIZE):
+        # Names and cities bring in the locale's accented characters
+        if i % 5 == 0:
+            pool.append(f"{fake.name()}, {fake.city()}.")
+        else:
+            pool.append(fake.sentence(nb_words=12))
+    return pool
+
+
+def _sentences(locale, seed):
+    """Endless reproducible stream of sentences"""
+    pool = _sentence_pool(locale, seed)
+    rng = random.Random(seed)
+    while True:
+        yield rng.choice(pool)
+
+
+def generate_txt(path, kind, size, seed):
+    """Write a .txt corpus of roughly `size` bytes"""
+    locale, encoding = TEXT_KINDS[kind]
+    sentences = _sentences(locale, seed)
+    line_limit = {'one_line': None, 'long_lines': LONG_LINE_LENGTH}.get(kind, 400)
+    written = 0
+    line_length = 0
+
+    with open(path, 'wb') as file:
+        while written < size:
+            sentence = next(sentences)
+            line_length += len(sentence) + 1
+
+            separator = ' '
+            if line_limit and line_length >= line_limit:
+                separator = '\n'
+                line_length = 0
+
+            data = (sentence + separator).encode(encoding, 'ignore')
+            file.write(data)
+            written += len(data)
+
+
+def generate_docx(path, kind, size, seed):
+    """Write a .docx corpus holding roughly `size` bytes of text"""
+    from docx import Document
+
+    sentences = _sentences('en_US', seed)
+    document = Document()
+    written = 0
+
+    while written < size:
+        if kind == 'paragraphs':
+            text = ' '.join(next(sentences) for _ in range(4))
+            document.add_paragraph(text)
+            written += len(text)
+            continue
+
+        table = document.add_table(rows=20, cols=4)
+        for row in table.rows:
+            for cell in row.cells:
+                text = next(sentences)
+                cell.text = text
+                written += len(text)
+        if kind == 'merged_cells':
+            # Merge the first two columns of every other row
+            for index in range(0, len(table.rows), 2):
+                cells = table.rows[index].cells
+                cells[0].merge(cells[1])
+
+    document.save(path)
+
+
+def ensure_corpus(directory, file_type, kind, size, seed):
+    """Generate a corpus file once, reuse it on later runs"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{kind}-{format_size(size)}-{seed}{file_type}")
+    if not os.path.exists(path):
+        if file_type == '.txt':
+            generate_txt(path, kind, size, seed)
+        else:
+            generate_docx(path, kind, size, seed)
+    return path
+
+
+def _with_statistics(chunks):
+    from .extraction import count_words
+    from .stats import TextStatistics
+
+    stats = TextStatistics()
+    return count_words(stats.track(chunks), consumers=[stats])
+
+
+def get_engines():
+    """Word counting engines to benchmark, per file type"""
+    from .extractors import iter_docx_chunks, iter_txt_chunks
+    from .tasks import count_words_docx, count_words_txt
+
+    return {
+        '.txt': {
+            'count_words_txt': count_words_txt,
+            'txt_with_statistics': lambda path: _with_statistics(iter_txt_chunks(path)),
+        },
+        '.docx': {
+            'count_words_docx': count_words_docx,
+            'docx_with_statistics': lambda path: _with_statistics(iter_docx_chunks(path)),
+        },
+    }
+
+
+def _measure(engine, path, queue):
+    # Runs in a forked child so peak RSS belongs to this run only
+    try:
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        words = engine(path)
+        elapsed = time.perf_counter() - start
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        queue.put(('ok', (words, elapsed, peak, peak - baseline)))
+    except BaseException:
+        queue.put(('error', traceback.format_exc()))
+
+
+def _collect(process, queue, timeout):
+    """Result of one child run, raises BenchmarkError when it fails, dies or hangs"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            status, result = queue.get(timeout=min(1, max(deadline - time.monotonic(), 0)))
+            break
+        except Empty:
+            if not process.is_alive():
+                process.join()
+                raise BenchmarkError(f"Benchmark process exited with code {process.exitcode} without a result")
+            if time.monotonic() >= deadline:
+                process.kill()
+                process.join()
+                raise BenchmarkError(f"Benchmark run timed out after {timeout}s")
+
+    process.join(timeout=10)
+    if status == 'error':
+        raise BenchmarkError(f"Engine raised in the benchmark process:\n{result}")
+    return result
+
+
+def run_case(engine, path, repeat, timeout=DEFAULT_TIMEOUT):
+    """Time an engine on one corpus file, `repeat` times in fresh processes"""
+    context = get_context('fork')
+    runs = []
+    for _ in range(repeat):
+        queue = context.Queue()
+        process = context.Process(target=_measure, args=(engine, path, queue))
+        process.start()
+        runs.append(_collect(process, queue, timeout))
+
+    words = runs[0][0]
+    times = [run[1] for run in runs]
+    best = min(times)
+    file_size = os.path.getsize(path)
+    return {
+        'words': words,
+        'file_size': file_size,
+        'seconds_min': round(best, 6),
+        'seconds_median': round(median(times), 6),
+        'mb_per_second': round(file_size / UNITS['MB'] / best, 3) if best else None,
+        'words_per_second': round(words / best) if best else None,
+        'peak_rss_kb': max(run[2] for run in runs),
+        'rss_growth_kb': max(run[3] for run in runs),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL,
+            text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(directory, sizes, seed=42, repeat=3, kinds=None, engines=None, timeout=DEFAULT_TIMEOUT, log=print):
+    """Generate corpora and benchmark every matching engine, returns a JSON-ready dict"""
+    cases = [('.txt', kind) for kind in TEXT_KINDS] + [('.docx', kind) for kind in DOCX_KINDS]
+    if kinds:
+        cases = [case for case in cases if case[1] in kinds]
+
+    results = []
+    available = get_engines()
+    for size in sizes:
+        for file_type, kind in cases:
+            path = ensure_corpus(directory, file_type, kind, size, seed)
+            for name, engine in available[file_type].items():
+                if engines and name not in engines:
+                    continue
+                log(f"{name} on {os.path.basename(path)}")
+                result = run_case(engine, path, repeat, timeout=timeout)
+                result.update({
+                    'engine': name,
+                    'file_type': file_type,
+                    'corpus': kind,
+                    'size': format_size(size),
+                })
+                results.append(result)
+
+    return {
+        'meta': {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': seed,
+            'repeat': repeat,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current):
+    """Throughput ratio current/baseline for every case present in both runs"""
+    def key(result):
+        return (result['engine'], result['corpus'], result['size'])
+
+    previous = {key(result): result for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        before = previous.get(key(result))
+        if not before or not before['mb_per_second'] or not result['mb_per_second']:
+            continue
+        rows.append((key(result), result['mb_per_second'] / before['mb_per_second']))
+    return rows
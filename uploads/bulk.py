@@ -0,0 +1,120 @@
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from aamarpay_file_upload import metrics, versioning
+from .models import FileUpload, ActivityLog
+from .outbox import enqueue_batch
+from .scheduler import get_priority_lane, has_recent_payment
+from .uploadhandlers import content_rejection, size_rejection
+import os
+import uuid
+import zipfile
+
+# Bytes read from an archive member to check its content
+SNIFF_SIZE = 64 * 1024
+
+
+class BulkUploadError(Exception):
+    """The bulk upload as a whole cannot be accepted"""
+
+
+def iter_archive(archive):
+    """
+    (name, file, error) for every file in a zip archive. Members are only
+    decompressed while they are stored, validation reads their first bytes.
+    """
+    try:
+        zip_file = zipfile.ZipFile(archive)
+    except (zipfile.BadZipFile, OSError):
+        raise BulkUploadError("The archive is not a valid zip file.")
+
+    unpacked = 0
+    for info in zip_file.infolist():
+        name = os.path.basename(info.filename)
+        # Folders and OS metadata (__MACOSX/, .DS_Store) are not uploads
+        if info.is_dir() or not name or name.startswith('.') or info.filename.startswith('__MACOSX/'):
+            continue
+
+        # Header sizes bound decompression, a member never inflates past them
+        if info.file_size > settings.UPLOAD_MAX_FILE_SIZE:
+            yield name, None, size_rejection(settings.UPLOAD_MAX_FILE_SIZE)
+            continue
+        unpacked += info.file_size
+        if unpacked > settings.UPLOAD_BULK_MAX_SIZE:
+            raise BulkUploadError(size_rejection(settings.UPLOAD_BULK_MAX_SIZE, 'Unpacked archive size'))
+
+        try:
+            with zip_file.open(info) as member:
+                head = member.read(SNIFF_SIZE)
+        except (zipfile.BadZipFile, NotImplementedError, RuntimeError) as e:
+            # Corrupt, encrypted or unsupported compression
+            yield name, None, f"Could not read file from archive: {str(e)}"
+            continue
+
+        error = content_rejection(os.path.splitext(name)[1].lower(), head)
+        if error:
+            yield name, None, error
+            continue
+
+        file = File(zip_file.open(info), name=name)
+        file.size = info.file_size
+        yield name, file, None
+
+
+def create_batch(user, files):
+    """
+    Store accepted (name, file) pairs as one bulk upload: one INSERT for the
+    files, one for their activity logs and one for the outbox, in a single
+    transaction. Returns the batch id and the created FileUploads.
+    """
+    batch_id = uuid.uuid4()
+    recently_paid = has_recent_payment(user)
+
+    try:
+        file_uploads = _insert_batch(user, files, batch_id, recently_paid)
+    finally:
+        # Archive members stay open until they are stored
+        for _, file in files:
+            file.close()
+
+    for file_upload in file_uploads:
+        metrics.UPLOAD_SIZE_BYTES.labels(file_type=file_upload.file_type).observe(file_upload.file_size)
+
+    return batch_id, file_uploads
+
+
+def _insert_batch(user, files, batch_id, recently_paid):
+    with transaction.atomic():
+        file_uploads = FileUpload.objects.bulk_create([
+            FileUpload(
+                user=user,
+                file=file,
+                filename=name[:255],
+                file_size=file.size,
+                file_type=os.path.splitext(name)[1].lower(),
+                priority=get_priority_lane(user, file.size, recently_paid=recently_paid),
+                batch_id=batch_id
+            )
+            for name, file in files
+        ])
+
+        ActivityLog.objects.bulk_create([
+            ActivityLog(
+                user=user,
+                action='file_uploaded',
+                metadata={
+                    'filename': file_upload.filename,
+                    'file_size': file_upload.file_size,
+                    'file_type': file_upload.file_type,
+                    'batch_id': str(batch_id)
+                }
+            )
+            for file_upload in file_uploads
+        ])
+
+        # Relayed after commit, the scheduler dispatches the batch as one task
+        enqueue_batch(file_uploads)
+        # bulk_create sends no post_save
+        versioning.bump_version(versioning.FILES, [user.pk])
+
+    return file_uploads
@@ -0,0 +1,111 @@
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .models import FileUpload, PendingFileRemoval
+import contextvars
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Names collected while FileUploadQuerySet.delete runs, None outside of it
+_batched_names = contextvars.ContextVar('batched_names', default=None)
+
+
+def queue_file_removals(names):
+    """
+    Record stored files to remove inside the deleting transaction, the purge
+    task runs once it commits. A rolled back delete leaves its files alone.
+    """
+    names = [name for name in names if name]
+    if not names:
+        return
+    PendingFileRemoval.objects.bulk_create([PendingFileRemoval(name=name) for name in names])
+    transaction.on_commit(schedule_purge, robust=True)
+
+
+@contextmanager
+def batched_removals():
+    """Collect the removals of a bulk delete and queue them in one INSERT"""
+    names = []
+    token = _batched_names.set(names)
+    try:
+        yield
+    finally:
+        _batched_names.reset(token)
+    queue_file_removals(names)
+
+
+@receiver(post_delete, sender=FileUpload)
+def queue_removal_on_delete(sender, instance, **kwargs):
+    """Single deletes and cascades (e.g. a deleted user) queue their file too"""
+    if not instance.file:
+        return
+    names = _batched_names.get()
+    if names is not None:
+        names.append(instance.file.name)
+    else:
+        queue_file_removals([instance.file.name])
+
+
+def schedule_purge():
+    from .tasks import purge_pending_removals
+
+    try:
+        purge_pending_removals.delay()
+    except Exception as e:
+        # The periodic purge picks the rows up
+        logger.error(f"Error scheduling file purge: {str(e)}")
+
+
+def purge_removed_files(batch_size=None):
+    """Delete queued files from storage, failures stay queued for the next run"""
+    batch_size = batch_size or settings.UPLOAD_PURGE_BATCH_SIZE
+    storage = FileUpload._meta.get_field('file').storage
+    removed = failed = 0
+    last_id = 0
+
+    while True:
+        with transaction.atomic():
+            # Concurrent purges skip each other's rows
+            entries = list(
+                PendingFileRemoval.objects.select_for_update(skip_locked=True)
+                .filter(id__gt=last_id)
+                .order_by('id')[:batch_size]
+            )
+            if not entries:
+                break
+            last_id = entries[-1].id
+
+            # A name freed by a delete can be taken by a later upload, keep that file
+            in_use = set(
+                FileUpload.objects.filter(file__in=[entry.name for entry in entries])
+                .values_list('file', flat=True)
+            )
+
+            done = []
+            for entry in entries:
+                if entry.name not in in_use:
+                    try:
+                        storage.delete(entry.name)
+                    except Exception as e:
+                        logger.error(f"Error removing stored file {entry.name}: {str(e)}")
+                        PendingFileRemoval.objects.filter(id=entry.id).update(
+                            attempts=F('attempts') + 1,
+                            last_error=str(e)
+                        )
+                        failed += 1
+                        continue
+                    removed += 1
+                done.append(entry.id)
+
+            PendingFileRemoval.objects.filter(id__in=done).delete()
+
+        if len(entries) < batch_size:
+            break
+
+    if removed or failed:
+        logger.info(f"Purged {removed} stored file(s), {failed} failed")
+    return {'removed': removed, 'failed': failed}
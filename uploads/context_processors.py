@@ -0,0 +1,9 @@
+from .extractors import allowed_extensions, describe_extensions
+
+
+def upload_formats(request):
+    """Accepted upload formats, from the extractor registry"""
+    return {
+        'upload_extensions': ','.join(allowed_extensions()),
+        'upload_extensions_display': describe_extensions(),
+    }
@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.utils import timezone
+from aamarpay_file_upload.renderers import ORJSONRenderer
+from payments.models import PaymentTransaction
+from payments.serializers import PaymentTransactionSerializer
+from .models import FileUpload, ActivityLog
+from .serializers import FileUploadListSerializer, ActivityLogSerializer
+import csv
+import json
+
+NDJSON = 'ndjson'
+CSV = 'csv'
+CONTENT_TYPES = {
+    NDJSON: 'application/x-ndjson',
+    CSV: 'text/csv; charset=utf-8',
+}
+
+# What can be exported: the user's rows, oldest first, in the list API's format
+EXPORTS = {
+    'files': (FileUpload, FileUploadListSerializer),
+    'activities': (ActivityLog, ActivityLogSerializer),
+    'transactions': (PaymentTransaction, PaymentTransactionSerializer),
+}
+
+# Spreadsheets run cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Echo:
+    """File-like object for csv.writer, returns each line instead of buffering it"""
+
+    def write(self, value):
+        return value
+
+
+def iter_rows(kind, user):
+    """
+    Rows of one export, read through a server-side cursor on PostgreSQL.
+    Only EXPORT_CHUNK_SIZE rows are held at a time, whatever the history.
+    """
+    model, serializer_class = EXPORTS[kind]
+    serializer = serializer_class()
+    tz = timezone.get_current_timezone()
+    rows = (
+        model.objects.filter(user=user)
+        .order_by('id')
+        .values(*serializer.values_fields)
+        .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    )
+    for row in rows:
+        yield serializer.represent_row(row, tz)
+
+
+def iter_ndjson(rows):
+    renderer = ORJSONRenderer()
+    for row in rows:
+        yield renderer.render(row) + b'\n'
+
+
+def _csv_cell(value):
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(rows, fields):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([_csv_cell(row[field]) for field in fields])
+
+
+def export_stream(kind, user, output):
+    """Chunks of an NDJSON or CSV export, produced while the response is sent"""
+    rows = iter_rows(kind, user)
+    if output == CSV:
+        return iter_csv(rows, EXPORTS[kind][1].Meta.fields)
+    return iter_ndjson(rows)
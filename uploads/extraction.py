@@ -0,0 +1,62 @@
+import codecs
+import re
+
+# Same tokens as re.findall(r'\b\w+\b', text)
+WORD_RE = re.compile(r'\w+')
+
+TEXT_CHUNK_SIZE = 1024 * 1024
+# A file without whitespace is one word, only this much of it is carried between chunks
+MAX_CARRY_LENGTH = 4096
+
+
+def iter_txt_chunks(file_path, chunk_size=TEXT_CHUNK_SIZE):
+    """
+    Decode a .txt file chunk by chunk. UTF-8 first, the rest of the file
+    falls back to latin-1 from the first undecodable chunk on.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    with open(file_path, 'rb') as file:
+        while True:
+            data = file.read(chunk_size)
+            if not data:
+                break
+            try:
+                yield decoder.decode(data)
+            except UnicodeDecodeError:
+                pending, _ = decoder.getstate()
+                decoder = codecs.getincrementaldecoder('latin-1')()
+                yield decoder.decode(pending + data)
+
+    try:
+        yield decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        # Truncated multi-byte sequence at the end of the file
+        pending, _ = decoder.getstate()
+        yield pending.decode('latin-1')
+
+
+def iter_word_batches(chunks):
+    """
+    Words per chunk, a word split across two chunks is carried over whole.
+    Words longer than MAX_CARRY_LENGTH still count once but are cut to that length.
+    """
+    carry = ''
+    for chunk in chunks:
+        text = carry + chunk if carry else chunk
+        # One linear pass, the last word is carried when it may go on in the next chunk
+        words = WORD_RE.findall(text)
+        carry = words.pop()[:MAX_CARRY_LENGTH] if words and WORD_RE.match(text, len(text) - 1) else ''
+        yield words
+
+    if carry:
+        yield [carry]
+
+
+def count_words(chunks, consumers=()):
+    """Count words in one pass, handing every batch to the consumers (e.g. the search indexer)"""
+    word_count = 0
+    for words in iter_word_batches(chunks):
+        word_count += len(words)
+        for consumer in consumers:
+            consumer.feed(words)
+    return word_count
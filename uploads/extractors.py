@@ -0,0 +1,342 @@
+from django.conf import settings
+from html.parser import HTMLParser
+from .extraction import iter_txt_chunks
+import codecs
+import csv
+import importlib.util
+import re
+import zipfile
+
+# Memory profiles
+STREAMING = 'streaming'  # bounded buffers whatever the file size
+DOCUMENT = 'document'    # whole document held in memory
+
+# Cost classes, heavy formats are routed to their own worker queue
+LIGHT = 'light'
+HEAVY = 'heavy'
+
+BATCH_SIZE = 64 * 1024
+
+
+# Signatures of common binary formats, never accepted as text
+BINARY_SIGNATURES = (
+    b'PK\x03\x04', b'%PDF', b'\x89PNG', b'GIF8', b'\xff\xd8\xff', b'MZ', b'\x7fELF',
+    b'\xd0\xcf\x11\xe0', b'Rar!', b'7z\xbc\xaf', b'\x1f\x8b',
+)
+CONTROL_BYTES = bytes(set(range(32)) - {9, 10, 12, 13}) + b'\x7f'
+
+
+def looks_like_text(head):
+    """UTF-8 (or latin-1) text heuristic over the first bytes of a file"""
+    if not head:
+        return True
+    if head.startswith(BINARY_SIGNATURES) or b'\x00' in head:
+        return False
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(head)
+        return True
+    except UnicodeDecodeError:
+        # Latin-1 text is accepted too, as long as it is not full of control bytes
+        controls = len(head) - len(head.translate(None, CONTROL_BYTES))
+        return controls / len(head) < 0.05
+
+
+def looks_like_rtf(head):
+    return head.lstrip(b'\xef\xbb\xbf').startswith(b'{\\rtf')
+
+
+def looks_like_docx(head):
+    # Office Open XML packages start with [Content_Types].xml
+    return head.startswith(b'PK\x03\x04') and b'[Content_Types].xml' in head
+
+
+def looks_like_odt(head):
+    # ODF stores the uncompressed mimetype entry first
+    return head.startswith(b'PK\x03\x04') and b'application/vnd.oasis.opendocument.text' in head[:100]
+
+
+class Extractor:
+    """A text extractor for one file extension"""
+
+    def __init__(self, extension, label, iter_chunks, memory, cost, requires=None, sniff=looks_like_text):
+        self.extension = extension
+        self.label = label
+        self.iter_chunks = iter_chunks
+        self.memory = memory
+        self.cost = cost
+        self.requires = requires
+        self.sniff = sniff
+        self._available = None
+
+    def available(self):
+        """
+        False when the optional package the format needs is not installed.
+        Looked up without importing it, the package loads on first extraction.
+        """
+        if self._available is None:
+            self._available = self.requires is None or importlib.util.find_spec(self.requires) is not None
+        return self._available
+
+    def __repr__(self):
+        return f"<Extractor {self.extension} {self.memory}/{self.cost}>"
+
+
+EXTRACTORS = {}
+
+
+def register(extension, label, memory=STREAMING, cost=LIGHT, requires=None, sniff=looks_like_text):
+    """
+    Register a generator of text chunks as the extractor for `extension`.
+    `sniff` checks the first uploaded bytes, see uploads.uploadhandlers.
+    """
+    def decorator(func):
+        EXTRACTORS[extension] = Extractor(extension, label, func, memory, cost, requires, sniff)
+        return func
+    return decorator
+
+
+def get_extractor(file_type):
+    """Extractor for an allowed, installed format, else None"""
+    extractor = EXTRACTORS.get(file_type)
+    if extractor is None or file_type not in allowed_extensions():
+        return None
+    return extractor
+
+
+def allowed_extensions():
+    """Extensions users may upload, ALLOWED_FILE_EXTENSIONS narrows the registry when set"""
+    only = settings.ALLOWED_FILE_EXTENSIONS
+    return [
+        extension for extension, extractor in EXTRACTORS.items()
+        if extractor.available() and (not only or extension in only)
+    ]
+
+
+def describe_extensions():
+    """'.txt, .md and .docx' for error messages"""
+    extensions = allowed_extensions()
+    if len(extensions) < 2:
+        return ''.join(extensions)
+    return f"{', '.join(extensions[:-1])} and {extensions[-1]}"
+
+
+def get_queue(file_type, file_size):
+    """Celery queue for a file: heavy formats and large in-memory documents go to the heavy queue"""
+    extractor = EXTRACTORS.get(file_type)
+    if extractor is None:
+        return settings.UPLOAD_LIGHT_QUEUE
+    if extractor.cost == HEAVY or (extractor.memory == DOCUMENT and file_size > settings.UPLOAD_SMALL_FILE_SIZE):
+        return settings.UPLOAD_HEAVY_QUEUE
+    return settings.UPLOAD_LIGHT_QUEUE
+
+
+def _batched(texts, size=BATCH_SIZE):
+    """Join small pieces of text into chunks of about `size` characters"""
+    pieces = []
+    length = 0
+    for text in texts:
+        pieces.append(text)
+        length += len(text)
+        if length >= size:
+            yield ''.join(pieces)
+            pieces = []
+            length = 0
+    if pieces:
+        yield ''.join(pieces)
+
+
+def iter_lines(file_path):
+    """Decoded lines of a text file, line endings kept"""
+    carry = ''
+    for chunk in iter_txt_chunks(file_path):
+        lines = (carry + chunk).splitlines(keepends=True)
+        carry = lines.pop() if lines and not lines[-1].endswith(('\n', '\r')) else ''
+        yield from lines
+    if carry:
+        yield carry
+
+
+register('.txt', 'Plain text')(iter_txt_chunks)
+
+
+# Link targets, images and inline HTML are not prose
+MARKDOWN_NOISE_RE = re.compile(r'!?\[([^\]]*)\]\([^)]*\)|<[^>\n]+>|^\s*```.*$', re.MULTILINE)
+
+
+@register('.md', 'Markdown')
+def iter_markdown_chunks(file_path):
+    for chunk in _batched(iter_lines(file_path)):
+        yield MARKDOWN_NOISE_RE.sub(lambda match: match.group(1) or ' ', chunk)
+
+
+@register('.csv', 'CSV')
+def iter_csv_chunks(file_path):
+    rows = csv.reader(iter_lines(file_path))
+    yield from _batched(' '.join(row) + '\n' for row in rows)
+
+
+class _HTMLTextParser(HTMLParser):
+    """Collects visible text, skipping scripts and styles"""
+    SKIPPED = {'script', 'style', 'template', 'noscript'}
+    BLOCKS = {'p', 'div', 'br', 'li', 'tr', 'td', 'th', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'section', 'article'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.skipping = 0
+        self.pieces = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED:
+            self.skipping += 1
+        elif tag in self.BLOCKS:
+            self.pieces.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED and self.skipping:
+            self.skipping -= 1
+        elif tag in self.BLOCKS:
+            self.pieces.append('\n')
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.pieces.append(data)
+
+    def take(self):
+        text = ''.join(self.pieces)
+        self.pieces = []
+        return text
+
+
+@register('.html', 'HTML')
+def iter_html_chunks(file_path):
+    parser = _HTMLTextParser()
+    for chunk in iter_txt_chunks(file_path):
+        parser.feed(chunk)
+        yield parser.take()
+    parser.close()
+    yield parser.take()
+
+
+# Control words, hex escapes and groups of an RTF document
+RTF_TOKEN_RE = re.compile(r"\\([a-z]{1,32})(-?\d{1,10})?[ ]?|\\'([0-9a-f]{2})|\\([^a-z])|([{}])|[\r\n]+|(.)", re.IGNORECASE)
+RTF_DESTINATIONS = frozenset("""
+aftncn aftnsep aftnsepc annotation atnauthor atndate atnicn atnid atnparent atnref atntime atrfend atrfstart
+author background bkmkend bkmkstart blipuid buptim category colorschememapping colortbl comment company
+creatim datafield datastore defchp defpap do doccomm docvar dptxbxtext ebcend ebcstart factoidname falt
+fchars ffdeftext ffentrymcr ffexitmcr ffformat ffhelptext ffl ffname ffstattext field file filetbl fldinst
+fldtype fname fontemb fontfile fonttbl footer footerf footerl footerr footnote formfield ftncn ftnsep
+ftnsepc g generator gridtbl header headerf headerl headerr hl hlfr hlinkbase hlloc hlsrc hsv htmltag info
+keycode keywords latentstyles lchars levelnumbers leveltext lfolevel linkval list listlevel listname
+listoverride listoverridetable listpicture liststylename listtable listtext lsdlockedexcept macc maccPr
+mailmerge maln malnScr manager margPr mbar mbarPr mbaseJc mbegChr mborderBox mborderBoxPr mbox mboxPr
+mchr mcount mctrlPr md mdeg mdegHide mden mdiff mdPr me mendChr meqArr meqArrPr mf mfName mfPr mfunc
+mfuncPr mgroupChr mgroupChrPr mgrow mhideBot mhideLeft mhideRight mhideTop mhtmltag mlim mlimloc mlimlow
+mlimlowPr mlimupp mlimuppPr mm mmaddfieldname mmath mmathPict mmathPr mmaxdist mmc mmcJc mmconnectstr
+mmconnectstrdata mmcPr mmcs mmdatasource mmheadersource mmmailsubject mmodso mmodsofilter mmodsofldmpdata
+mmodsomappedname mmodsoname mmodsorecipdata mmodsosort mmodsosrc mmodsotable mmodsoudl mmodsoudldata
+mmodsouniquetag mmPr mmquery mmr mnary mnaryPr mnoBreak mnum mobjDist moMath moMathPara moMathParaPr
+mopEmu mphant mphantPr mplcHide mpos mr mrad mradPr mrPr msepChr mshow mshp msPre msPrePr msSub msSubPr
+msSubSup msSubSupPr msSup msSupPr mstrikeBLTR mstrikeH mstrikeTLBR mstrikeV msub msubHide msup msupHide
+mtransp mtype mvertJc mvfmf mvfml mvtof mvtol mzeroAsc mzeroDesc mzeroWid nesttableprops nextfile
+nonesttables objalias objclass objdata object objname objsect objtime oldcprops oldpprops oldsprops
+oldtprops oleclsid operator panose password passwordhash pgp pgptbl picprop pict pn pnseclvl pntext
+pntxta pntxtb printim private propname protend protstart protusertbl pxe result revtbl revtim rsidtbl
+rxe shp shpgrp shpinst shppict shprslt shptxt sn sp staticval stylesheet subject sv svb tc template
+themedata title txe ud upr userprops wgrffmtfilter windowcaption writereservation writereservhash xe
+xform xmlattrname xmlattrvalue xmlclose xmlname xmlnstbl xmlopen
+""".split())
+RTF_SPECIALS = {'par': '\n', 'sect': '\n', 'page': '\n', 'line': '\n', 'tab': ' ', 'cell': ' ', 'row': '\n'}
+
+
+@register('.rtf', 'Rich Text Format', memory=DOCUMENT, sniff=looks_like_rtf)
+def iter_rtf_chunks(file_path):
+    with open(file_path, 'rb') as file:
+        document = file.read().decode('latin-1')
+
+    stack = []
+    ignorable = False
+    skip_unicode = 1
+    skip = 0
+    pieces = []
+    for match in RTF_TOKEN_RE.finditer(document):
+        word, arg, hex_code, symbol, brace, char = match.groups()
+        if brace:
+            skip = 0
+            if brace == '{':
+                stack.append((skip_unicode, ignorable))
+            elif stack:
+                skip_unicode, ignorable = stack.pop()
+        elif symbol:
+            skip = 0
+            if symbol == '*':
+                ignorable = True
+            elif not ignorable and symbol in '\\{}':
+                pieces.append(symbol)
+            elif not ignorable and symbol == '~':
+                pieces.append(' ')
+        elif word:
+            skip = 0
+            if word in RTF_DESTINATIONS:
+                ignorable = True
+            elif ignorable:
+                pass
+            elif word in RTF_SPECIALS:
+                pieces.append(RTF_SPECIALS[word])
+            elif word == 'uc':
+                skip_unicode = int(arg or 1)
+            elif word == 'u' and arg:
+                code = int(arg)
+                pieces.append(chr(code + 0x10000 if code < 0 else code))
+                skip = skip_unicode
+        elif hex_code:
+            if skip:
+                skip -= 1
+            elif not ignorable:
+                pieces.append(bytes([int(hex_code, 16)]).decode('cp1252', 'replace'))
+        elif char:
+            if skip:
+                skip -= 1
+            elif not ignorable:
+                pieces.append(char)
+
+        if len(pieces) >= BATCH_SIZE:
+            yield ''.join(pieces)
+            pieces = []
+
+    yield ''.join(pieces)
+
+
+@register('.docx', 'Word document', memory=DOCUMENT, cost=HEAVY, requires='docx', sniff=looks_like_docx)
+def iter_docx_chunks(file_path):
+    """Text of every paragraph and table cell in a .docx file"""
+    from docx import Document
+
+    doc = Document(file_path)
+    for paragraph in doc.paragraphs:
+        yield paragraph.text + '\n'
+
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                yield cell.text + '\n'
+
+
+ODF_TEXT_NS = 'urn:oasis:names:tc:opendocument:xmlns:text:1.0'
+ODF_BLOCKS = {f'{{{ODF_TEXT_NS}}}p', f'{{{ODF_TEXT_NS}}}h'}
+
+
+@register('.odt', 'OpenDocument text', cost=HEAVY, sniff=looks_like_odt)
+def iter_odt_chunks(file_path):
+    from xml.etree.ElementTree import iterparse
+
+    # content.xml is parsed straight from the archive, finished blocks are freed
+    with zipfile.ZipFile(file_path) as archive, archive.open('content.xml') as content:
+        texts = []
+        for event, element in iterparse(content, events=('end',)):
+            if element.tag in ODF_BLOCKS:
+                texts.append(''.join(element.itertext()) + '\n')
+                element.clear()
+            if len(texts) >= 256:
+                yield ''.join(texts)
+                texts = []
+        yield ''.join(texts)
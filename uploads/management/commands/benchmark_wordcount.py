@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from uploads.benchmarks import DEFAULT_SIZES, DEFAULT_TIMEOUT, BenchmarkError, compare, parse_size, run_benchmarks
+import json
+import os
+import tempfile
+
+
+class Command(BaseCommand):
+    help = 'Benchmark word counting on generated .txt and .docx corpora and emit JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default=','.join(DEFAULT_SIZES), help='Comma separated corpus sizes, e.g. 1KB,1MB,100MB')
+        parser.add_argument('--kinds', default='', help='Only these corpora, e.g. ascii,bengali,tables')
+        parser.add_argument('--engines', default='', help='Only these engines, e.g. count_words_txt')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per case, the fastest one is reported')
+        parser.add_argument('--seed', type=int, default=42, help='Seed for corpus generation')
+        parser.add_argument('--timeout', type=int, default=DEFAULT_TIMEOUT, help='Seconds a single run may take')
+        parser.add_argument(
+            '--corpus-dir',
+            default=os.path.join(tempfile.gettempdir(), 'wordcount-corpus'),
+            help='Where generated corpora are cached'
+        )
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+        parser.add_argument('--compare', help='Previous JSON report to compare throughput against')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [parse_size(size) for size in options['sizes'].split(',') if size]
+        except ValueError:
+            raise CommandError(f"Invalid --sizes value: {options['sizes']}")
+
+        try:
+            report = run_benchmarks(
+                options['corpus_dir'],
+                sizes,
+                seed=options['seed'],
+                repeat=options['repeat'],
+                kinds=[kind for kind in options['kinds'].split(',') if kind],
+                engines=[engine for engine in options['engines'].split(',') if engine],
+                timeout=options['timeout'],
+                log=lambda message: self.stderr.write(message),
+            )
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+            self.stderr.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            with open(options['compare']) as file:
+                baseline = json.load(file)
+            for (engine, corpus, size), ratio in compare(baseline, report):
+                style = self.style.ERROR if ratio < 0.9 else self.style.SUCCESS
+                self.stderr.write(style(f"{engine:<20} {corpus:<14} {size:>6}  {ratio:6.2f}x"))
@@ -0,0 +1,87 @@
+from collections import Counter
+from django.core.management.base import BaseCommand
+import json
+import subprocess
+import sys
+import time
+
+# What a cold process imports before it can serve its first request or task
+TARGETS = {
+    'web': (
+        "import aamarpay_file_upload.wsgi\n"
+        "from django.urls import get_resolver\n"
+        "get_resolver().url_patterns"
+    ),
+    'worker': (
+        "import django\n"
+        "django.setup()\n"
+        "from aamarpay_file_upload.celery import app\n"
+        "app.loader.import_default_modules()"
+    ),
+}
+
+
+def parse_importtime(output):
+    """(module, self us, cumulative us, depth) for every line of -X importtime output"""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        imports.append((name.strip(), int(self_us), int(cumulative_us), (len(name) - len(name.lstrip()) - 1) // 2))
+    return imports
+
+
+def profile_target(code, top, by):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'import failed')
+
+    imports = parse_importtime(result.stderr)
+    if by == 'package':
+        # Self times add up without overlap, e.g. everything docx costs
+        totals = Counter()
+        for name, self_us, _, _ in imports:
+            totals[name.split('.')[0]] += self_us
+        top_entries = [{'name': name, 'ms': round(us / 1000, 1)} for name, us in totals.most_common(top)]
+    else:
+        top_entries = [
+            {'name': name, 'ms': round(self_us / 1000, 1)}
+            for name, self_us, _, _ in sorted(imports, key=lambda entry: entry[1], reverse=True)[:top]
+        ]
+
+    return {
+        'wall_seconds': round(wall, 3),
+        'import_seconds': round(sum(entry[2] for entry in imports if entry[3] == 0) / 1e6, 3),
+        'modules': len(imports),
+        'top': top_entries,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Measure what a fresh web or worker process imports at startup, slowest modules first'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=[*TARGETS, 'all'], default='all', help='Process to profile')
+        parser.add_argument('--top', type=int, default=15, help='Modules listed per target')
+        parser.add_argument('--by', choices=['package', 'module'], default='package',
+                            help='Sum import time per top-level package, or list single modules')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        targets = TARGETS if options['target'] == 'all' else [options['target']]
+        report = {target: profile_target(TARGETS[target], options['top'], options['by']) for target in targets}
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for target, result in report.items():
+            self.stdout.write(self.style.SUCCESS(
+                f"{target}: {result['modules']} modules, {result['import_seconds']}s importing, "
+                f"{result['wall_seconds']}s to start"
+            ))
+            for entry in result['top']:
+                self.stdout.write(f"  {entry['ms']:>8.1f}ms  {entry['name']}")
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from uploads.reconcile import ACTIONS, reconcile_storage
+import json
+
+
+class Command(BaseCommand):
+    help = 'Find stored files without a FileUpload row, and rows without a stored file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--action', choices=ACTIONS, default='report', help='What to do with orphaned files')
+        parser.add_argument('--chunk-size', type=int, default=settings.UPLOAD_RECONCILE_CHUNK_SIZE, help='Files compared per query')
+        parser.add_argument('--grace', type=int, default=settings.UPLOAD_ORPHAN_GRACE_PERIOD, help='Seconds, younger files are skipped')
+        parser.add_argument('--skip-missing', action='store_true', help='Do not check rows for missing files')
+        parser.add_argument('--json', action='store_true', help='Print the full report as JSON')
+
+    def handle(self, *args, **options):
+        report = reconcile_storage(
+            action=options['action'],
+            chunk_size=options['chunk_size'],
+            grace_period=options['grace'],
+            check_missing=not options['skip_missing']
+        )
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"Scanned {report['scanned']} file(s), {report['scanned_bytes']} bytes in {report['duration_seconds']}s")
+        for name in report['orphan_sample']:
+            self.stdout.write(f"  orphan: {name}")
+        for file_id in report['missing_sample']:
+            self.stdout.write(f"  missing file for FileUpload {file_id}")
+
+        summary = (
+            f"{report['orphans']} orphaned file(s) ({report['orphan_bytes']} bytes), "
+            f"{report['reclaimed_bytes']} bytes reclaimed by {report['action']}, "
+            f"{report['missing']} row(s) without a file, {report['errors']} error(s)"
+        )
+        if report['orphans'] or report['missing']:
+            self.stdout.write(self.style.WARNING(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
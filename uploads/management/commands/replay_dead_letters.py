@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from uploads.models import FileUpload, ProcessingDeadLetter
+from uploads.scheduler import dispatch_pending, requeue_files
+
+
+class Command(BaseCommand):
+    help = 'Re-queue dead-lettered files for processing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help='Dead letter ids (default: every unreplayed entry)')
+        parser.add_argument('--limit', type=int, default=10000, help='Maximum number of entries to replay')
+        parser.add_argument('--batch-size', type=int, default=500, help='Entries re-queued per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be replayed')
+
+    def handle(self, *args, **options):
+        letters = ProcessingDeadLetter.objects.filter(replayed_at__isnull=True)
+        if options['ids']:
+            letters = letters.filter(id__in=options['ids'])
+
+        entries = list(letters.order_by('created_at').values_list('id', 'file_upload_id')[:options['limit']])
+        if options['dry_run']:
+            self.stdout.write(f"{len(entries)} dead letter(s) would be replayed")
+            return
+
+        batch_size = options['batch_size']
+        replayed = 0
+        for start in range(0, len(entries), batch_size):
+            batch = entries[start:start + batch_size]
+            letter_ids = [letter_id for letter_id, _ in batch]
+            file_ids = {file_id for _, file_id in batch}
+
+            with transaction.atomic():
+                requeue_files(file_ids)
+                # A replay starts over, the reaper and batch retries count attempts from here
+                FileUpload.objects.filter(id__in=file_ids).update(processing_attempts=0)
+                replayed += ProcessingDeadLetter.objects.filter(id__in=letter_ids).update(replayed_at=timezone.now())
+
+        dispatched = dispatch_pending()
+        self.stdout.write(self.style.SUCCESS(
+            f"Replayed {replayed} dead letter(s), {dispatched} file(s) dispatched right away"
+        ))
@@ -0,0 +1,36 @@
+# Generated by Django 5.1 on 2026-10-19 11:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_existing_dispatched(apps, schema_editor):
+    # Files uploaded before the scheduler were already sent to Celery
+    FileUpload = apps.get_model('uploads', 'FileUpload')
+    FileUpload.objects.filter(dispatched_at__isnull=True).update(dispatched_at=models.F('upload_time'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0002_fileupload_file_size_fileupload_file_type_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='dispatched_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='fileupload',
+            name='priority',
+            field=models.PositiveSmallIntegerField(default=6),
+        ),
+        migrations.RunPython(mark_existing_dispatched, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='fileupload',
+            index=models.Index(condition=models.Q(('dispatched_at__isnull', True), ('status', 'processing')), fields=['priority', 'upload_time'], name='fileupload_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1 on 2026-10-19 11:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0003_fileupload_scheduling'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessingDeadLetter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.CharField(blank=True, max_length=255)),
+                ('error', models.TextField()),
+                ('traceback', models.TextField(blank=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('replayed_at', models.DateTimeField(blank=True, null=True)),
+                ('file_upload', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dead_letters', to='uploads.fileupload')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1 on 2026-10-19 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0004_processingdeadletter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessingOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('file_upload', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='uploads.fileupload')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
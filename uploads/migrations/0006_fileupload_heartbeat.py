@@ -0,0 +1,34 @@
+# Generated by Django 5.1 on 2026-10-19 11:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0005_processingoutbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='fileupload',
+            name='processing_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='fileupload',
+            name='task_id',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='fileupload',
+            index=models.Index(condition=models.Q(('dispatched_at__isnull', False), ('status', 'processing')), fields=['dispatched_at'], name='fileupload_inflight_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# Trigram indexes backing the admin's icontains searches, which PostgreSQL
+# runs as UPPER(col::text) LIKE UPPER('%term%'). Built CONCURRENTLY so large
+# tables stay writable; skipped on other databases.
+INDEXES = [
+    ('uploads_fileupload_filename_trgm', 'uploads_fileupload', 'filename'),
+    ('auth_user_username_trgm', 'auth_user', 'username'),
+    ('auth_user_email_trgm', 'auth_user', 'email'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+            f'ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for name, table, column in INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('uploads', '0007_activitylog_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.1 on 2026-10-19 11:32
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_gin_index(apps, schema_editor):
+    # GIN is PostgreSQL only, other databases search through FileSearchTerm
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS uploads_filesearchdocument_vector_gin '
+        'ON uploads_filesearchdocument USING gin (search_vector)'
+    )
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('DROP INDEX IF EXISTS uploads_filesearchdocument_vector_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0008_search_trigram_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileSearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(null=True)),
+                ('indexed_at', models.DateTimeField(auto_now=True)),
+                ('file_upload', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='uploads.fileupload')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FileSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('frequency', models.PositiveIntegerField(default=1)),
+                ('file_upload', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='uploads.fileupload')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'term'], name='filesearchterm_user_term_idx')],
+            },
+        ),
+        migrations.RunPython(create_gin_index, drop_gin_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-19 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0009_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='text_stats',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-19 11:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0010_fileupload_text_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='batch_id',
+            field=models.UUIDField(blank=True, db_index=True, null=True),
+        ),
+    ]
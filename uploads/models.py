@@ -1,7 +1,40 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
 import os
 
+
+def format_file_size(size):
+    """Convert bytes to human readable format"""
+    if size < 1024:
+        return f"{size} B"
+    elif size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    else:
+        return f"{size / (1024 * 1024):.1f} MB"
+
+
+class FileUploadQuerySet(models.QuerySet):
+    def status_summary(self):
+        """File counts per status and total words in one query"""
+        summary = self.aggregate(
+            total_files=models.Count('id'),
+            completed_files=models.Count('id', filter=models.Q(status='completed')),
+            processing_files=models.Count('id', filter=models.Q(status='processing')),
+            failed_files=models.Count('id', filter=models.Q(status='failed')),
+            total_words=models.Sum('word_count', filter=models.Q(status='completed')),
+        )
+        summary['total_words'] = summary['total_words'] or 0
+        return summary
+
+    def delete(self):
+        """Delete the rows, their stored files are queued for removal in one INSERT"""
+        from .cleanup import batched_removals
+
+        with transaction.atomic(using=self.db), batched_removals():
+            return super().delete()
+
+
 class FileUpload(models.Model):
     STATUS_CHOICES = [
         ('processing', 'Processing'),
@@ -15,23 +48,40 @@ class FileUpload(models.Model):
     upload_time = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='processing')
     word_count = models.PositiveIntegerField(default=0)
+    text_stats = models.JSONField(default=dict, blank=True)  # see uploads.stats.TextStatistics
     file_size = models.PositiveIntegerField(default=0)  # in bytes
     file_type = models.CharField(max_length=10, default='')
+    priority = models.PositiveSmallIntegerField(default=6)  # scheduler lane, lower runs first
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    task_id = models.CharField(max_length=255, blank=True, default='')
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # set by the worker while it runs
+    processing_attempts = models.PositiveSmallIntegerField(default=0)
+    batch_id = models.UUIDField(null=True, blank=True, db_index=True)  # bulk uploads, processed together
+
+    objects = FileUploadQuerySet.as_manager()
 
     class Meta:
         ordering = ['-upload_time']
+        indexes = [
+            # Files waiting for the scheduler
+            models.Index(
+                fields=['priority', 'upload_time'],
+                name='fileupload_pending_idx',
+                condition=models.Q(status='processing', dispatched_at__isnull=True),
+            ),
+            # Dispatched files watched by the stale reaper
+            models.Index(
+                fields=['dispatched_at'],
+                name='fileupload_inflight_idx',
+                condition=models.Q(status='processing', dispatched_at__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.filename} ({self.user.username})"
 
     def get_file_size_display(self):
-        """Convert bytes to human readable format"""
-        if self.file_size < 1024:
-            return f"{self.file_size} B"
-        elif self.file_size < 1024 * 1024:
-            return f"{self.file_size / 1024:.1f} KB"
-        else:
-            return f"{self.file_size / (1024 * 1024):.1f} MB"
+        return format_file_size(self.file_size)
 
     def save(self, *args, **kwargs):
         if self.file:
@@ -40,18 +90,6 @@ class FileUpload(models.Model):
             self.file_type = os.path.splitext(self.filename)[1].lower()
         super().save(*args, **kwargs)
 
-    def delete(self, *args, **kwargs):
-        """Delete file from storage when model is deleted"""
-        if self.file:
-            # Delete physical file
-            try:
-                if os.path.isfile(self.file.path):
-                    os.remove(self.file.path)
-            except Exception as e:
-                print(f"Error deleting file {self.file.path}: {e}")
-        
-        super().delete(*args, **kwargs)
-
 
 class ActivityLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -61,6 +99,80 @@ class ActivityLog(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Append-only table, read newest first (admin changelist, per-user feed)
+            models.Index(fields=['-timestamp'], name='activitylog_time_idx'),
+            models.Index(fields=['user', '-timestamp'], name='activitylog_user_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.action}"
+
+class ProcessingDeadLetter(models.Model):
+    """Files whose processing kept failing after every retry"""
+    file_upload = models.ForeignKey(FileUpload, on_delete=models.CASCADE, related_name='dead_letters')
+    task_id = models.CharField(max_length=255, blank=True)
+    error = models.TextField()
+    traceback = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    replayed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.file_upload_id} - {self.error[:50]}"
+
+
+class ProcessingOutbox(models.Model):
+    """Processing requests written in the upload's transaction, relayed to the scheduler after commit"""
+    file_upload = models.ForeignKey(FileUpload, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"Outbox {self.id} - file {self.file_upload_id}"
+
+
+class FileSearchDocument(models.Model):
+    """PostgreSQL full-text index of a file's contents (GIN index added in migration 0009)"""
+    file_upload = models.OneToOneField(FileUpload, on_delete=models.CASCADE, related_name='search_document')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    search_vector = SearchVectorField(null=True)
+    indexed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Search document - file {self.file_upload_id}"
+
+
+class FileSearchTerm(models.Model):
+    """Inverted index entry, used when the database is not PostgreSQL"""
+    file_upload = models.ForeignKey(FileUpload, on_delete=models.CASCADE, related_name='search_terms')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    term = models.CharField(max_length=64)
+    frequency = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'term'], name='filesearchterm_user_term_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} x{self.frequency} - file {self.file_upload_id}"
+
+
+class PendingFileRemoval(models.Model):
+    """Stored file of a deleted upload, removed from storage by a background task"""
+    name = models.CharField(max_length=255)  # storage name, as in FileUpload.file
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
 
     def __str__(self):
-        return f"{self.user.username} - {self.action}"
\ No newline at end of file
+        return self.name
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.db import transaction
+from .models import ProcessingOutbox
+from .scheduler import dispatch_pending
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_for_processing(file_upload):
+    """
+    Record a processing request inside the caller's transaction. Nothing
+    reaches the broker until the upload row is committed.
+    """
+    ProcessingOutbox.objects.create(file_upload=file_upload)
+    transaction.on_commit(relay_outbox, robust=True)
+
+
+def enqueue_batch(file_uploads):
+    """enqueue_for_processing for a bulk upload, one INSERT for all of them"""
+    ProcessingOutbox.objects.bulk_create([ProcessingOutbox(file_upload=file_upload) for file_upload in file_uploads])
+    transaction.on_commit(relay_outbox, robust=True)
+
+
+def relay_outbox(batch_size=None):
+    """Hand committed outbox entries to the scheduler in batches"""
+    batch_size = batch_size or settings.UPLOAD_OUTBOX_BATCH_SIZE
+    relayed = 0
+
+    while True:
+        with transaction.atomic():
+            # Concurrent relays skip each other's rows instead of double publishing
+            entries = list(
+                ProcessingOutbox.objects.select_for_update(skip_locked=True, of=('self',))
+                .order_by('id')
+                .values_list('id', 'file_upload__user_id')[:batch_size]
+            )
+            if not entries:
+                break
+
+            ProcessingOutbox.objects.filter(id__in=[entry_id for entry_id, _ in entries]).delete()
+
+        # Files are now pending on committed rows, the scheduler claims each one exactly once
+        dispatch_pending(user_ids={user_id for _, user_id in entries})
+        relayed += len(entries)
+
+        if len(entries) < batch_size:
+            break
+
+    if relayed:
+        logger.info(f"Relayed {relayed} outbox entr{'y' if relayed == 1 else 'ies'}")
+    return relayed
@@ -0,0 +1,84 @@
+from celery import current_app
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from aamarpay_file_upload import metrics, versioning
+from .models import FileUpload, ActivityLog
+from .scheduler import dispatch_pending, release_slot, requeue_files
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def find_stale_files():
+    """
+    Files stuck in processing: a worker started them but stopped sending
+    heartbeats, or the message never reached a worker at all.
+    """
+    now = timezone.now()
+    heartbeat_cutoff = now - timedelta(seconds=settings.UPLOAD_STALE_HEARTBEAT_AFTER)
+    queued_cutoff = now - timedelta(seconds=settings.UPLOAD_STALE_QUEUED_AFTER)
+
+    return FileUpload.objects.filter(
+        status='processing',
+        dispatched_at__isnull=False
+    ).filter(
+        Q(heartbeat_at__lt=heartbeat_cutoff) |
+        Q(heartbeat_at__isnull=True, dispatched_at__lt=queued_cutoff)
+    )
+
+
+def reap_stale_files():
+    """Re-queue stale files, or fail them once they used up their attempts"""
+    max_attempts = settings.UPLOAD_PROCESSING_MAX_ATTEMPTS
+    with transaction.atomic():
+        # Locked while they are reaped, a worker finishing one meanwhile waits and is not overwritten.
+        # Rows locked by a reaper running concurrently are left to it.
+        stale = list(
+            find_stale_files()
+            .select_for_update(skip_locked=True)
+            .values_list('id', 'user_id', 'filename', 'task_id', 'processing_attempts')[:settings.UPLOAD_REAPER_BATCH_SIZE]
+        )
+        metrics.STALE_FILES_FOUND.set(len(stale))
+        metrics.REAPER_LAST_RUN.set_to_current_time()
+        if not stale:
+            return {'found': 0, 'requeued': 0, 'failed': 0}
+
+        requeue_ids = [row[0] for row in stale if row[4] < max_attempts]
+        failed = [row for row in stale if row[4] >= max_attempts]
+
+        requeued = requeue_files(requeue_ids) if requeue_ids else 0
+        if failed:
+            FileUpload.objects.filter(id__in=[row[0] for row in failed], status='processing').update(status='failed')
+            versioning.bump_version(versioning.FILES, [row[1] for row in failed])
+            ActivityLog.objects.bulk_create([
+                ActivityLog(
+                    user_id=user_id,
+                    action='file_processing_failed',
+                    metadata={
+                        'filename': filename,
+                        'error': f'Processing stalled after {attempts} attempt(s)'
+                    }
+                )
+                for _, user_id, filename, _, attempts in failed
+            ])
+
+    # Drop any copy still sitting in the broker, then give the slots back:
+    # one per message, a batch holds a single slot for all of its files
+    messages = {(row[1], row[3]) for row in stale if row[3]}
+    if messages:
+        try:
+            current_app.control.revoke([task_id for _, task_id in messages])
+        except Exception as e:
+            logger.error(f"Error revoking stale tasks: {str(e)}")
+    for user_id, _ in messages:
+        release_slot(user_id)
+
+    metrics.STALE_FILES_REQUEUED.inc(requeued)
+    metrics.STALE_FILES_FAILED.inc(len(failed))
+    logger.warning(f"Reaped {len(stale)} stale file(s): {requeued} re-queued, {len(failed)} failed")
+
+    dispatch_pending(user_ids={row[1] for row in stale})
+    return {'found': len(stale), 'requeued': requeued, 'failed': len(failed)}
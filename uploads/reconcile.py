@@ -0,0 +1,171 @@
+from django.conf import settings
+from django.utils import timezone
+from aamarpay_file_upload import metrics
+from .models import FileUpload, PendingFileRemoval
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+REPORT = 'report'
+QUARANTINE = 'quarantine'
+DELETE = 'delete'
+ACTIONS = (REPORT, QUARANTINE, DELETE)
+
+# Orphans and missing files listed in the report, the counts cover all of them
+SAMPLE_SIZE = 100
+
+
+def _storage():
+    return FileUpload._meta.get_field('file').storage
+
+
+def iter_stored_files(root, location):
+    """
+    (storage name, size, mtime) for every file under `root`, depth first.
+    os.scandir hands back the stat data, one directory is held at a time.
+    """
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        name = os.path.relpath(entry.path, location).replace(os.sep, '/')
+                        yield name, stat.st_size, stat.st_mtime
+        except FileNotFoundError:
+            # Removed while we were walking
+            continue
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _known_names(names):
+    """Names that belong to a row, or are already queued for the purge task"""
+    known = set(FileUpload.objects.filter(file__in=names).values_list('file', flat=True))
+    known.update(PendingFileRemoval.objects.filter(name__in=names).values_list('name', flat=True))
+    return known
+
+
+def _quarantine(location, name, stamp):
+    target = os.path.join(location, settings.UPLOAD_QUARANTINE_DIR, stamp, name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(os.path.join(location, name), target)
+
+
+def find_orphans(action, chunk_size, grace_period, report):
+    """Stored files without a row, compared against the database one chunk at a time"""
+    storage = _storage()
+    location = storage.location
+    root = os.path.join(location, FileUpload._meta.get_field('file').upload_to)
+    # Files this recent may belong to an upload whose transaction has not committed yet
+    cutoff = time.time() - grace_period
+    stamp = timezone.now().strftime('%Y%m%d%H%M%S')
+
+    for chunk in _chunks(iter_stored_files(root, location), chunk_size):
+        report['scanned'] += len(chunk)
+        report['scanned_bytes'] += sum(size for _, size, _ in chunk)
+        known = _known_names([name for name, _, _ in chunk])
+
+        for name, size, mtime in chunk:
+            if name in known or mtime > cutoff:
+                continue
+            report['orphans'] += 1
+            report['orphan_bytes'] += size
+            if len(report['orphan_sample']) < SAMPLE_SIZE:
+                report['orphan_sample'].append(name)
+            if action == REPORT:
+                continue
+
+            try:
+                if action == QUARANTINE:
+                    _quarantine(location, name, stamp)
+                else:
+                    storage.delete(name)
+            except OSError as e:
+                logger.error(f"Error reclaiming orphaned file {name}: {str(e)}")
+                report['errors'] += 1
+                continue
+            report['reclaimed_bytes'] += size
+
+
+def find_missing(chunk_size, report):
+    """Rows whose stored file is gone, walked in primary key order"""
+    storage = _storage()
+    last_id = 0
+    while True:
+        rows = list(
+            FileUpload.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'file')[:chunk_size]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        for file_id, name in rows:
+            if name and not storage.exists(name):
+                report['missing'] += 1
+                if len(report['missing_sample']) < SAMPLE_SIZE:
+                    report['missing_sample'].append(file_id)
+
+        if len(rows) < chunk_size:
+            break
+
+
+def reconcile_storage(action=None, chunk_size=None, grace_period=None, check_missing=True):
+    """
+    Compare stored files with FileUpload rows. Orphans (files without a row)
+    are reported, quarantined or deleted; rows without a file are reported.
+    Memory stays bounded by the chunk size whatever the number of files.
+    """
+    action = action or settings.UPLOAD_ORPHAN_ACTION
+    if action not in ACTIONS:
+        raise ValueError(f"Unknown orphan action: {action}")
+    chunk_size = chunk_size or settings.UPLOAD_RECONCILE_CHUNK_SIZE
+    grace_period = settings.UPLOAD_ORPHAN_GRACE_PERIOD if grace_period is None else grace_period
+
+    report = {
+        'action': action,
+        'scanned': 0,
+        'scanned_bytes': 0,
+        'orphans': 0,
+        'orphan_bytes': 0,
+        'reclaimed_bytes': 0,
+        'errors': 0,
+        'missing': 0,
+        'orphan_sample': [],
+        'missing_sample': [],
+    }
+    started = time.perf_counter()
+
+    find_orphans(action, chunk_size, grace_period, report)
+    if check_missing:
+        find_missing(chunk_size, report)
+    report['duration_seconds'] = round(time.perf_counter() - started, 3)
+
+    metrics.ORPHAN_FILES_FOUND.set(report['orphans'])
+    metrics.MISSING_FILES_FOUND.set(report['missing'])
+    metrics.STORAGE_RECLAIMED_BYTES.inc(report['reclaimed_bytes'])
+    metrics.RECONCILE_LAST_RUN.set_to_current_time()
+
+    if report['orphans'] or report['missing']:
+        logger.warning(
+            f"Storage reconciliation: {report['orphans']} orphaned file(s) ({report['orphan_bytes']} bytes, "
+            f"{report['reclaimed_bytes']} reclaimed by {action}), {report['missing']} row(s) without a file"
+        )
+    return report
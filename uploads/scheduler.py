@@ -0,0 +1,237 @@
+from celery import current_app
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Min
+from django.utils import timezone
+from aamarpay_file_upload import versioning
+from payments.models import PaymentTransaction
+from .extractors import get_queue
+from .models import FileUpload
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes (Celery Redis transport: 0 is served first)
+PRIORITY_EXPRESS = 0   # small file from a recently paid user
+PRIORITY_ELEVATED = 3  # small file, or a recently paid user
+PRIORITY_DEFAULT = 6
+
+
+def has_recent_payment(user):
+    """True when the user completed a payment within UPLOAD_PAID_PRIORITY_WINDOW"""
+    paid_since = timezone.now() - timedelta(seconds=settings.UPLOAD_PAID_PRIORITY_WINDOW)
+    return PaymentTransaction.objects.filter(
+        user=user,
+        status='completed',
+        timestamp__gte=paid_since
+    ).exists()
+
+
+def get_priority_lane(user, file_size, recently_paid=None):
+    """Pick the priority lane for a new upload, bulk uploads pass recently_paid in"""
+    lane = PRIORITY_DEFAULT
+    if file_size <= settings.UPLOAD_SMALL_FILE_SIZE:
+        lane -= 3
+
+    if recently_paid is None:
+        recently_paid = has_recent_payment(user)
+    if recently_paid:
+        lane -= 3
+
+    return lane
+
+
+def _slot_key(user_id):
+    return f'uploads:inflight:{user_id}'
+
+
+def acquire_slot(user_id):
+    """Take one of the user's processing slots, returns False when the cap is reached"""
+    key = _slot_key(user_id)
+    timeout = settings.UPLOAD_SLOT_TIMEOUT
+
+    cache.add(key, 0, timeout=timeout)
+    try:
+        inflight = cache.incr(key)
+    except ValueError:
+        # Key expired between add() and incr()
+        cache.add(key, 1, timeout=timeout)
+        inflight = 1
+
+    if inflight > settings.UPLOAD_USER_CONCURRENCY:
+        release_slot(user_id)
+        return False
+
+    # Leaked slots (e.g. a killed worker) expire once the user goes idle
+    cache.touch(key, timeout)
+    return True
+
+
+def release_slot(user_id):
+    """Give a processing slot back"""
+    key = _slot_key(user_id)
+    try:
+        if cache.decr(key) < 0:
+            cache.set(key, 0, timeout=settings.UPLOAD_SLOT_TIMEOUT)
+    except ValueError:
+        pass
+
+
+def free_slots(user_id):
+    """Number of slots the user can still take"""
+    inflight = cache.get(_slot_key(user_id), 0)
+    return max(settings.UPLOAD_USER_CONCURRENCY - inflight, 0)
+
+
+def _dispatch(file_id, user_id, priority, queue, producer=None):
+    """
+    Claim a pending file and hand it to Celery, the claim guarantees a single
+    dispatch. The message names the owner, whose slot it holds.
+    """
+    from .tasks import process_file_word_count
+
+    # The task id is stored with the claim, workers ignore messages carrying any other id
+    task_id = str(uuid.uuid4())
+    claimed = FileUpload.objects.filter(
+        id=file_id,
+        status='processing',
+        dispatched_at__isnull=True
+    ).update(dispatched_at=timezone.now(), task_id=task_id, heartbeat_at=None)
+    if not claimed:
+        return False
+
+    try:
+        process_file_word_count.apply_async(
+            args=[file_id],
+            kwargs={'owner_id': user_id},
+            task_id=task_id,
+            priority=priority,
+            queue=queue,
+            producer=producer
+        )
+    except Exception as e:
+        # Broker unavailable: leave the file pending for the next dispatcher run
+        logger.error(f"Error dispatching file {file_id}: {str(e)}")
+        FileUpload.objects.filter(id=file_id).update(dispatched_at=None, task_id='')
+        return False
+
+    return True
+
+
+def _dispatch_batch(batch_id, user_id, priority, producer=None):
+    """
+    Claim up to UPLOAD_BATCH_TASK_SIZE pending files of a bulk upload and hand
+    them to Celery as one message. The batch takes a single processing slot.
+    """
+    from .tasks import process_file_batch
+
+    task_id = str(uuid.uuid4())
+    file_ids = list(
+        FileUpload.objects.filter(batch_id=batch_id, status='processing', dispatched_at__isnull=True)
+        .order_by('id')
+        .values_list('id', flat=True)[:settings.UPLOAD_BATCH_TASK_SIZE]
+    )
+    claimed = FileUpload.objects.filter(
+        id__in=file_ids,
+        status='processing',
+        dispatched_at__isnull=True
+    ).update(dispatched_at=timezone.now(), task_id=task_id, heartbeat_at=None)
+    if not claimed:
+        return False
+
+    # Another dispatcher may have claimed some of them first
+    files = list(FileUpload.objects.filter(task_id=task_id).values_list('id', 'file_type', 'file_size'))
+    queues = {get_queue(file_type, file_size) for _, file_type, file_size in files}
+    # One heavy file sends the whole batch to the heavy workers
+    queue = settings.UPLOAD_HEAVY_QUEUE if settings.UPLOAD_HEAVY_QUEUE in queues else settings.UPLOAD_LIGHT_QUEUE
+
+    try:
+        process_file_batch.apply_async(
+            args=[[file_id for file_id, _, _ in files]],
+            kwargs={'owner_id': user_id},
+            task_id=task_id,
+            priority=priority,
+            queue=queue,
+            producer=producer
+        )
+    except Exception as e:
+        logger.error(f"Error dispatching batch {batch_id}: {str(e)}")
+        FileUpload.objects.filter(task_id=task_id).update(dispatched_at=None, task_id='')
+        return False
+
+    return True
+
+
+def dispatch_pending(user_ids=None):
+    """
+    Dispatch pending files round-robin across users, never exceeding a
+    user's concurrency cap. Higher priority lanes go first.
+    """
+    pending = FileUpload.objects.filter(status='processing', dispatched_at__isnull=True)
+    if user_ids is not None:
+        pending = pending.filter(user_id__in=user_ids)
+
+    # Users with waiting files, best lane and oldest upload first
+    users = (
+        pending.values('user_id')
+        .annotate(best_priority=Min('priority'), oldest=Min('upload_time'))
+        .order_by('best_priority', 'oldest')
+        .values_list('user_id', flat=True)[:settings.UPLOAD_DISPATCH_BATCH_SIZE]
+    )
+
+    queues = OrderedDict()
+    for uid in users:
+        slots = free_slots(uid)
+        if not slots:
+            continue
+        queues[uid] = list(
+            pending.filter(user_id=uid)
+            .order_by('priority', 'upload_time')
+            .values_list('id', 'priority', 'file_type', 'file_size', 'batch_id')[:slots]
+        )
+
+    dispatched = 0
+    if not queues:
+        return dispatched
+
+    # One broker connection for the whole run, one file per user per round
+    with current_app.producer_or_acquire() as producer:
+        while queues:
+            for uid in list(queues):
+                if not queues[uid] or not acquire_slot(uid):
+                    del queues[uid]
+                    continue
+
+                file_id, priority, file_type, file_size, batch_id = queues[uid].pop(0)
+                if batch_id:
+                    # The batch message covers the user's other files from this batch
+                    queues[uid] = [entry for entry in queues[uid] if entry[4] != batch_id]
+                    sent = _dispatch_batch(batch_id, uid, priority, producer=producer)
+                else:
+                    sent = _dispatch(file_id, uid, priority, get_queue(file_type, file_size), producer=producer)
+                if sent:
+                    dispatched += 1
+                else:
+                    release_slot(uid)
+
+    if dispatched:
+        logger.info(f"Dispatched {dispatched} pending file(s)")
+    return dispatched
+
+
+def requeue_files(file_ids):
+    """Put files back in the pending state in one statement, the dispatcher picks them up"""
+    files = FileUpload.objects.filter(id__in=file_ids)
+    user_ids = set(files.values_list('user_id', flat=True))
+    requeued = files.update(
+        status='processing',
+        dispatched_at=None,
+        task_id='',
+        heartbeat_at=None
+    )
+    # update() sends no post_save, pages and the file API must not keep the old status
+    versioning.bump_version(versioning.FILES, user_ids)
+    return requeued
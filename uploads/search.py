@@ -0,0 +1,116 @@
+from collections import Counter
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Cast
+from .extraction import WORD_RE
+from .models import FileUpload, FileSearchDocument, FileSearchTerm
+
+MAX_TERM_LENGTH = 64
+MAX_TERM_POSITIONS = 8  # positions kept per lexeme, enough for ts_rank to weigh frequency
+
+
+def use_postgres_search():
+    """tsvector search on PostgreSQL, the FileSearchTerm inverted index elsewhere"""
+    backend = settings.UPLOAD_SEARCH_BACKEND
+    if backend:
+        return backend == 'postgres'
+    return connection.vendor == 'postgresql'
+
+
+def normalize_terms(text):
+    return [word.lower() for word in WORD_RE.findall(text) if len(word) <= MAX_TERM_LENGTH]
+
+
+def build_tsvector(terms):
+    """tsvector literal from (term, frequency) pairs"""
+    position = 1
+    lexemes = []
+    for term, frequency in terms:
+        repeat = min(frequency, MAX_TERM_POSITIONS)
+        positions = ','.join(str(min(p, 16383)) for p in range(position, position + repeat))
+        lexemes.append(f"'{term}':{positions}")
+        position += repeat
+    return ' '.join(lexemes)
+
+
+def build_tsquery(terms):
+    """tsquery literal matching every term"""
+    return ' & '.join(f"'{term}'" for term in terms)
+
+
+class LexemeQuery(SearchQuery):
+    """
+    tsquery literal cast as is, like the indexed tsvector. to_tsquery and
+    plainto_tsquery would run the terms through the text parser, which
+    splits foo_bar into two lexemes that were never indexed.
+    """
+    template = '(%(expressions)s)::tsquery'
+
+
+class SearchIndexer:
+    """Collects term frequencies while a file is being counted, then stores them in one go"""
+
+    def __init__(self, terms=None):
+        # Term counts can come from TextStatistics, which already tallied them
+        self.max_terms = settings.UPLOAD_SEARCH_MAX_TERMS
+        self.terms = terms if terms is not None else Counter()
+
+    def feed(self, words):
+        self.terms.update(map(str.lower, words))
+        if len(self.terms) > self.max_terms * 2:
+            # Bound memory on huge vocabularies, keep the most frequent terms
+            self.terms = Counter(dict(self.terms.most_common(self.max_terms)))
+
+    def indexed_terms(self):
+        return [
+            (term, frequency)
+            for term, frequency in self.terms.most_common(self.max_terms)
+            if len(term) <= MAX_TERM_LENGTH
+        ]
+
+    def save(self, file_upload):
+        """Replace the file's index entries"""
+        terms = self.indexed_terms()
+        with transaction.atomic():
+            if use_postgres_search():
+                FileSearchDocument.objects.update_or_create(
+                    file_upload=file_upload,
+                    defaults={
+                        'user_id': file_upload.user_id,
+                        'search_vector': Cast(Value(build_tsvector(terms)), output_field=SearchVectorField()),
+                    }
+                )
+            else:
+                FileSearchTerm.objects.filter(file_upload=file_upload).delete()
+                FileSearchTerm.objects.bulk_create(
+                    [
+                        FileSearchTerm(file_upload=file_upload, user_id=file_upload.user_id, term=term, frequency=frequency)
+                        for term, frequency in terms
+                    ],
+                    batch_size=1000
+                )
+
+
+def search_files(user, query):
+    """User's processed files containing every word of the query, best match first"""
+    terms = sorted(set(normalize_terms(query)))
+    files = FileUpload.objects.filter(user=user, status='completed')
+    if not terms:
+        return files.none()
+
+    if use_postgres_search():
+        search_query = LexemeQuery(build_tsquery(terms))
+        return (
+            files.filter(search_document__search_vector=search_query)
+            .annotate(rank=SearchRank(F('search_document__search_vector'), search_query))
+            .order_by('-rank', '-upload_time')
+        )
+
+    return (
+        files.filter(search_terms__user=user, search_terms__term__in=terms)
+        .annotate(rank=Sum('search_terms__frequency'), matched=Count('search_terms__term', distinct=True))
+        .filter(matched=len(terms))
+        .order_by('-rank', '-upload_time')
+    )
@@ -1,13 +1,12 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import FileUpload, ActivityLog
-from django.core.validators import FileExtensionValidator
+from aamarpay_file_upload.serializers import ValuesListSerializer, format_datetime
+from .models import FileUpload, ActivityLog, format_file_size
+from .extractors import allowed_extensions, describe_extensions
 import os
 
 class FileUploadSerializer(serializers.ModelSerializer):
-    file = serializers.FileField(
-        validators=[FileExtensionValidator(allowed_extensions=['txt', 'docx'])],
-        write_only=True
-    )
+    file = serializers.FileField(write_only=True)
     file_size_display = serializers.CharField(source='get_file_size_display', read_only=True)
 
     class Meta:
@@ -28,10 +27,9 @@ class FileUploadSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("File size cannot exceed 10MB.")
         
         # Check file extension
-        allowed_extensions = ['.txt', '.docx']
         file_extension = os.path.splitext(value.name)[1].lower()
-        if file_extension not in allowed_extensions:
-            raise serializers.ValidationError("Only .txt and .docx files are allowed.")
+        if file_extension not in allowed_extensions():
+            raise serializers.ValidationError(f"Only {describe_extensions()} files are allowed.")
         
         return value
 
@@ -40,21 +38,69 @@ class FileUploadSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class BulkDeleteSerializer(serializers.Serializer):
+    file_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.UPLOAD_BULK_MAX_FILES
+    )
+
+
 class FileUploadListSerializer(serializers.ModelSerializer):
     """Serializer for listing files without file field"""
     file_size_display = serializers.CharField(source='get_file_size_display', read_only=True)
 
+    values_fields = [
+        'id', 'filename', 'upload_time', 'status',
+        'word_count', 'text_stats', 'file_size', 'file_type'
+    ]
+
     class Meta:
         model = FileUpload
         fields = [
             'id', 'filename', 'upload_time', 'status', 
-            'word_count', 'file_size', 'file_size_display', 
+            'word_count', 'text_stats', 'file_size', 'file_size_display', 
             'file_type'
         ]
+        list_serializer_class = ValuesListSerializer
+
+    def represent_row(self, row, tz):
+        return {
+            'id': row['id'],
+            'filename': row['filename'],
+            'upload_time': format_datetime(row['upload_time'], tz),
+            'status': row['status'],
+            'word_count': row['word_count'],
+            'text_stats': row['text_stats'],
+            'file_size': row['file_size'],
+            'file_size_display': format_file_size(row['file_size']),
+            'file_type': row['file_type'],
+        }
+
+
+class FileSearchResultSerializer(FileUploadListSerializer):
+    """File list entry with its search rank"""
+    rank = serializers.FloatField(read_only=True)
+    values_fields = FileUploadListSerializer.values_fields + ['rank']
+
+    class Meta(FileUploadListSerializer.Meta):
+        fields = FileUploadListSerializer.Meta.fields + ['rank']
+
+    def represent_row(self, row, tz):
+        data = super().represent_row(row, tz)
+        data['rank'] = float(row['rank'])
+        return data
 
 
 class ActivityLogSerializer(serializers.ModelSerializer):
+    values_fields = ['id', 'action', 'metadata', 'timestamp']
+
     class Meta:
         model = ActivityLog
         fields = ['id', 'action', 'metadata', 'timestamp']
-        read_only_fields = ['id', 'timestamp']
\ No newline at end of file
+        read_only_fields = ['id', 'timestamp']
+        list_serializer_class = ValuesListSerializer
+
+    def represent_row(self, row, tz):
+        row['timestamp'] = format_datetime(row['timestamp'], tz)
+        return row
@@ -0,0 +1,117 @@
+from collections import Counter
+from django.conf import settings
+import math
+import re
+
+SENTENCE_END_RE = re.compile(r'[.!?।॥]+')  # includes the Bengali danda
+SENTENCE_END_CHARS = '.!?।॥'
+
+# Left out of the top terms only
+STOP_WORDS = frozenset("""
+a about after all also an and any are as at be because been but by can could did do does for from had
+has have he her his how i if in into is it its just me more most my no not of on one only or other our
+out she so some than that the their them then there these they this to up us was we were what when
+which who will with would you your
+""".split())
+
+
+class HyperLogLog:
+    """Cardinality estimate in fixed memory (2**precision registers, ~1.04/sqrt(m) error)"""
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    def add(self, value):
+        # str hashes are salted per process, fine for an estimate that is never persisted
+        x = hash(value) & 0xFFFFFFFFFFFFFFFF
+        index = x >> (64 - self.precision)
+        rest = x & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size ** 2 / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # Small range correction
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
+
+
+class TextStatistics:
+    """
+    Text statistics gathered in the word counting pass. Term counts are exact
+    until UPLOAD_STATS_EXACT_TERMS distinct terms, then unique words come from
+    a HyperLogLog and top terms from a pruned (heavy hitter) counter.
+    """
+
+    def __init__(self):
+        self.exact_limit = settings.UPLOAD_STATS_EXACT_TERMS
+        self.terms = Counter()
+        self.hll = None
+        self.characters = 0
+        self.newlines = 0
+        self.sentences = 0
+        self.last_char = ''
+        self.last_visible = ''
+
+    def track(self, chunks):
+        """Pass text chunks through, counting characters, lines and sentences"""
+        for chunk in chunks:
+            if chunk:
+                self.characters += len(chunk)
+                self.newlines += chunk.count('\n')
+                self.sentences += len(SENTENCE_END_RE.findall(chunk))
+                # "..." split across two chunks is one sentence end
+                if chunk[0] in SENTENCE_END_CHARS and self.last_char in SENTENCE_END_CHARS:
+                    self.sentences -= 1
+                self.last_char = chunk[-1]
+                stripped = chunk.rstrip()
+                if stripped:
+                    self.last_visible = stripped[-1]
+            yield chunk
+
+    def feed(self, words):
+        lowered = list(map(str.lower, words))
+        self.terms.update(lowered)
+
+        if self.hll is None and len(self.terms) > self.exact_limit:
+            self.hll = HyperLogLog()
+            for term in self.terms:
+                self.hll.add(term)
+        elif self.hll is not None:
+            for term in set(lowered):
+                self.hll.add(term)
+
+        if self.hll is not None and len(self.terms) > self.exact_limit:
+            self.terms = Counter(dict(self.terms.most_common(self.exact_limit // 2)))
+
+    def as_dict(self, word_count):
+        """Compact JSON form stored on FileUpload.text_stats"""
+        lines = self.newlines + (1 if self.characters and self.last_char != '\n' else 0)
+
+        # Text after the last terminator is a sentence too
+        sentences = self.sentences
+        if word_count and self.last_visible not in SENTENCE_END_CHARS:
+            sentences += 1
+
+        top_terms = []
+        for term, count in self.terms.most_common():
+            if term not in STOP_WORDS and not term.isdigit():
+                top_terms.append([term, count])
+                if len(top_terms) >= settings.UPLOAD_STATS_TOP_TERMS:
+                    break
+
+        return {
+            'characters': self.characters,
+            'lines': lines,
+            'sentences': sentences,
+            'unique_words': self.hll.count() if self.hll else len(self.terms),
+            'unique_words_estimated': self.hll is not None,
+            'top_terms': top_terms,
+            'reading_time_minutes': math.ceil(word_count / settings.UPLOAD_STATS_READING_WPM) if word_count else 0,
+        }
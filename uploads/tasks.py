@@ -1,59 +1,230 @@
-from celery import shared_task
+from celery import shared_task, Task
+from celery.exceptions import SoftTimeLimitExceeded
+from celery.utils.time import get_exponential_backoff_interval
 from django.conf import settings
-from .models import FileUpload, ActivityLog
+from django.db import InterfaceError, OperationalError, transaction
+from django.db.models import F
+from django.utils import timezone
+from aamarpay_file_upload import metrics
+from .cleanup import purge_removed_files
+from .extraction import count_words
+from .extractors import EXTRACTORS, get_extractor, iter_docx_chunks, iter_txt_chunks
+from .models import FileUpload, ActivityLog, ProcessingDeadLetter
+from .outbox import relay_outbox
+from .reaper import reap_stale_files
+from .reconcile import reconcile_storage
+from .scheduler import dispatch_pending, release_slot, requeue_files
+from .search import SearchIndexer
+from .stats import TextStatistics
+import errno
 import os
-import re
+import time
 import logging
+import traceback
+import uuid
 
 logger = logging.getLogger(__name__)
 
-try:
-    from docx import Document
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
-    logger.warning("python-docx not installed. .docx files will not be processed.")
+# Storage errors that usually go away on their own
+TRANSIENT_ERRNOS = {errno.EIO, errno.EAGAIN, errno.EBUSY, errno.EINTR, errno.ESTALE, errno.ETIMEDOUT}
 
-@shared_task
-def process_file_word_count(file_upload_id):
+
+class TransientProcessingError(Exception):
+    """Processing failed for a reason worth retrying"""
+
+
+def is_transient_error(exc):
+    """Classify an exception raised while processing a file"""
+    if isinstance(exc, (OperationalError, InterfaceError, TimeoutError, ConnectionError)):
+        return True
+    return isinstance(exc, OSError) and exc.errno in TRANSIENT_ERRNOS
+
+
+def mark_file_failed(file_upload, error):
+    """Set a file to failed and log it"""
+    file_upload.status = 'failed'
+    # Only the status, the dispatch and attempt fields may have moved on since the row was read
+    file_upload.save(update_fields=['status'])
+
+    ActivityLog.objects.create(
+        user=file_upload.user,
+        action='file_processing_failed',
+        metadata={
+            'filename': file_upload.filename,
+            'error': str(error)
+        }
+    )
+
+
+def dead_letter(file_upload, task_id, error, trace, attempts):
+    """Record a file whose transient errors outlived every retry and fail it, replay_dead_letters re-queues it"""
+    ProcessingDeadLetter.objects.create(
+        file_upload=file_upload,
+        task_id=task_id or '',
+        error=str(error),
+        traceback=trace,
+        attempts=attempts
+    )
+    mark_file_failed(file_upload, error)
+
+
+def retry_countdown(retries):
+    """Seconds before the next attempt, the backoff process_file_word_count retries with"""
+    return get_exponential_backoff_interval(
+        factor=settings.UPLOAD_RETRY_BACKOFF,
+        retries=retries,
+        maximum=settings.UPLOAD_RETRY_BACKOFF_MAX,
+        full_jitter=True
+    )
+
+
+def fail_batch_file(task_id, file_upload, error):
     """
-    Celery task to count words in uploaded file
+    Record a file of a batch that raised, the way process_file_word_count
+    would, and return its outcome for the processing metrics.
     """
-    try:
-        file_upload = FileUpload.objects.get(id=file_upload_id)
-        file_path = file_upload.file.path
-        
-        logger.info(f"Processing file: {file_path}")
-        
-        # Check if file exists
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
-        
-        # Count words based on file type
-        if file_upload.file_type == '.txt':
-            word_count = count_words_txt(file_path)
-        elif file_upload.file_type == '.docx' and DOCX_AVAILABLE:
-            word_count = count_words_docx(file_path)
-        else:
-            raise ValueError(f"Unsupported file type or missing dependencies: {file_upload.file_type}")
-        
-        # Update file upload record
+    attempts = file_upload.processing_attempts + 1
+    if not is_transient_error(error):
+        logger.error(f"Error processing file {file_upload.id} in batch: {str(error)}")
+        mark_file_failed(file_upload, error)
+        return 'failed'
+    if attempts <= settings.UPLOAD_PROCESSING_MAX_RETRIES:
+        logger.warning(f"Transient error processing file {file_upload.id} in batch (attempt {attempts}): {str(error)}")
+        requeue_after_backoff(file_upload, attempts - 1)
+        return 'retry'
+    logger.error(f"Giving up on file {file_upload.id} in batch after {attempts} attempt(s): {str(error)}")
+    dead_letter(file_upload, task_id, error, traceback.format_exc(), attempts)
+    return 'failed'
+
+
+def keep_alive(chunks, file_ids):
+    """Pass chunks through, refreshing the files' heartbeat every UPLOAD_HEARTBEAT_INTERVAL seconds"""
+    interval = settings.UPLOAD_HEARTBEAT_INTERVAL
+    last = time.monotonic()
+    for chunk in chunks:
+        now = time.monotonic()
+        if now - last >= interval:
+            FileUpload.objects.filter(id__in=file_ids).update(heartbeat_at=timezone.now())
+            last = now
+        yield chunk
+
+
+def process_file(file_upload, heartbeat_ids=None):
+    """
+    Count words, gather statistics and index a file, then mark it completed.
+    The heartbeat of the file, or of heartbeat_ids, is kept fresh while it is read.
+    """
+    started = time.perf_counter()
+    file_path = file_upload.file.path
+    
+    logger.info(f"Processing file: {file_path}")
+    
+    # Check if file exists
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+    
+    # Count words based on file type
+    extractor = get_extractor(file_upload.file_type)
+    if extractor is None:
+        raise ValueError(f"Unsupported file type or missing dependencies: {file_upload.file_type}")
+
+    # Single pass over the text, statistics and search terms are gathered while counting
+    stats = TextStatistics()
+    chunks = keep_alive(extractor.iter_chunks(file_path), heartbeat_ids or [file_upload.id])
+    word_count = count_words(stats.track(chunks), consumers=[stats])
+
+    counting_time = time.perf_counter() - started
+    if counting_time > 0:
+        metrics.PROCESSING_WORDS_PER_SECOND.labels(file_type=file_upload.file_type).observe(word_count / counting_time)
+        metrics.PROCESSING_BYTES_PER_SECOND.labels(file_type=file_upload.file_type).observe(file_upload.file_size / counting_time)
+    
+    # Update file upload record
+    with transaction.atomic():
+        if settings.UPLOAD_SEARCH_ENABLED:
+            SearchIndexer(terms=stats.terms).save(file_upload)
         file_upload.word_count = word_count
+        file_upload.text_stats = stats.as_dict(word_count)
         file_upload.status = 'completed'
-        file_upload.save()
+        file_upload.save(update_fields=['word_count', 'text_stats', 'status'])
+
+    return word_count
+
+
+def processed_activity(file_upload, word_count):
+    """Unsaved file_processed log entry"""
+    return ActivityLog(
+        user_id=file_upload.user_id,
+        action='file_processed',
+        metadata={
+            'filename': file_upload.filename,
+            'word_count': word_count,
+            'file_size': file_upload.file_size,
+            'processing_status': 'success'
+        }
+    )
+
+
+class FileProcessingTask(Task):
+    """Dead-letters files whose transient errors outlived every retry"""
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        file_upload_id = args[0] if args else kwargs.get('file_upload_id')
+        logger.error(f"Giving up on file {file_upload_id} after {self.request.retries + 1} attempt(s): {str(exc)}")
+
+        try:
+            file_upload = FileUpload.objects.get(id=file_upload_id)
+            dead_letter(file_upload, task_id, exc, str(einfo), self.request.retries + 1)
+        except Exception as e:
+            logger.error(f"Error dead-lettering file {file_upload_id}: {str(e)}")
+
+
+@shared_task(
+    bind=True,
+    base=FileProcessingTask,
+    autoretry_for=(TransientProcessingError,),
+    max_retries=settings.UPLOAD_PROCESSING_MAX_RETRIES,
+    retry_backoff=settings.UPLOAD_RETRY_BACKOFF,
+    retry_backoff_max=settings.UPLOAD_RETRY_BACKOFF_MAX,
+    retry_jitter=True,
+    soft_time_limit=settings.UPLOAD_PROCESSING_TIME_LIMIT,
+    time_limit=settings.UPLOAD_PROCESSING_TIME_LIMIT + 60,
+)
+def process_file_word_count(self, file_upload_id, owner_id=None):
+    """
+    Celery task to count words in uploaded file. owner_id is the user whose
+    slot the dispatch took, released even when the file is gone.
+    """
+    user_id = None
+    retrying = False
+    started = None
+    outcome = 'failed'
+    try:
+        file_upload = FileUpload.objects.get(id=file_upload_id)
+        user_id = file_upload.user_id
+
+        # Duplicate delivery, or a message superseded by a newer dispatch
+        superseded = file_upload.task_id and file_upload.task_id != self.request.id
+        if file_upload.status != 'processing' or superseded:
+            logger.info(f"Skipping file {file_upload_id}, status is {file_upload.status}")
+            user_id = None
+            return {'status': 'skipped', 'file_id': file_upload_id}
+
+        # Heartbeat for the stale reaper
+        now = timezone.now()
+        FileUpload.objects.filter(id=file_upload_id).update(
+            heartbeat_at=now,
+            processing_attempts=F('processing_attempts') + 1
+        )
+        if file_upload.dispatched_at and not self.request.retries:
+            metrics.PROCESSING_QUEUE_WAIT_SECONDS.observe((now - file_upload.dispatched_at).total_seconds())
+        started = time.perf_counter()
+
+        word_count = process_file(file_upload)
         
         # Log activity
-        ActivityLog.objects.create(
-            user=file_upload.user,
-            action='file_processed',
-            metadata={
-                'filename': file_upload.filename,
-                'word_count': word_count,
-                'file_size': file_upload.file_size,
-                'processing_status': 'success'
-            }
-        )
+        processed_activity(file_upload, word_count).save()
         
+        outcome = 'success'
         logger.info(f"File processed successfully. Word count: {word_count}")
         return {
             'status': 'success',
@@ -62,66 +233,228 @@ def process_file_word_count(file_upload_id):
         }
         
     except FileUpload.DoesNotExist:
+        # Deleted while its message was queued, the slot still has to go back
         logger.error(f"FileUpload with id {file_upload_id} not found")
+        user_id = owner_id
         return {'status': 'error', 'message': 'File not found'}
         
     except Exception as e:
+        if is_transient_error(e):
+            # Keep the slot, autoretry re-queues the file with backoff
+            retrying = self.request.retries < self.max_retries
+            outcome = 'retry'
+            logger.warning(f"Transient error processing file {file_upload_id} (attempt {self.request.retries + 1}): {str(e)}")
+            raise TransientProcessingError(str(e)) from e
+
         logger.error(f"Error processing file {file_upload_id}: {str(e)}")
         
         # Update status to failed
         try:
             file_upload = FileUpload.objects.get(id=file_upload_id)
-            file_upload.status = 'failed'
-            file_upload.save()
-            
-            # Log failure
-            ActivityLog.objects.create(
-                user=file_upload.user,
-                action='file_processing_failed',
-                metadata={
-                    'filename': file_upload.filename,
-                    'error': str(e)
-                }
-            )
+            mark_file_failed(file_upload, e)
         except:
             pass
             
         return {'status': 'error', 'message': str(e)}
 
+    finally:
+        if started is not None:
+            metrics.PROCESSING_SECONDS.labels(
+                file_type=file_upload.file_type,
+                outcome=outcome
+            ).observe(time.perf_counter() - started)
+
+        # Free the user's slot and start their next waiting file
+        if user_id is not None and not retrying:
+            release_slot(user_id)
+            dispatch_pending(user_ids=[user_id])
+
+
+def requeue_after_backoff(file_upload, retries):
+    """
+    Send a batch file back to the scheduler once its retry backoff has
+    passed. Until then it stays claimed by the delayed requeue task.
+    """
+    task_id = str(uuid.uuid4())
+    # A fresh heartbeat keeps the reaper away while the file waits
+    FileUpload.objects.filter(id=file_upload.id).update(task_id=task_id, heartbeat_at=timezone.now())
+    try:
+        requeue_batch_file.apply_async(args=[file_upload.id], task_id=task_id, countdown=retry_countdown(retries))
+    except Exception as e:
+        logger.error(f"Error scheduling retry of file {file_upload.id}, re-queueing it now: {str(e)}")
+        requeue_files([file_upload.id])
+
+
+@shared_task(bind=True, ignore_result=True)
+def requeue_batch_file(self, file_upload_id):
+    """
+    Delayed requeue of a batch file after a transient error, skipped when
+    the file was reaped, deleted or replayed in the meantime.
+    """
+    user_id = (
+        FileUpload.objects.filter(id=file_upload_id, status='processing', task_id=self.request.id)
+        .values_list('user_id', flat=True)
+        .first()
+    )
+    if user_id is None:
+        return
+    requeue_files([file_upload_id])
+    dispatch_pending(user_ids=[user_id])
+
+
+@shared_task(
+    bind=True,
+    # A whole batch gets the time its files would get as single-file jobs
+    soft_time_limit=settings.UPLOAD_PROCESSING_TIME_LIMIT * settings.UPLOAD_BATCH_TASK_SIZE,
+    time_limit=settings.UPLOAD_PROCESSING_TIME_LIMIT * settings.UPLOAD_BATCH_TASK_SIZE + 60,
+)
+def process_file_batch(self, file_upload_ids, owner_id=None):
+    """
+    Process the files of a bulk upload one after another in a single task.
+    Transient errors send a file back to the scheduler after a backoff
+    instead of retrying the whole batch; files out of retries are
+    dead-lettered like single-file jobs. When the batch runs out of time
+    the file being processed fails and the rest go back to the scheduler.
+    owner_id is the user whose slot the batch holds.
+    """
+    user_id = None
+    completed = failed = requeued = 0
+    activities = []
+    try:
+        # Files claimed by this message only, duplicates and superseded messages find none
+        files = list(
+            FileUpload.objects.filter(id__in=file_upload_ids, status='processing', task_id=self.request.id)
+            .order_by('id')
+        )
+        if not files:
+            logger.info(f"Skipping batch {self.request.id}, no files left to process")
+            if not FileUpload.objects.filter(id__in=file_upload_ids).exists():
+                # All deleted while the message was queued, give the batch's slot back
+                user_id = owner_id
+            return {'status': 'skipped', 'file_ids': file_upload_ids}
+        user_id = files[0].user_id
+
+        now = timezone.now()
+        FileUpload.objects.filter(id__in=[f.id for f in files]).update(
+            heartbeat_at=now,
+            processing_attempts=F('processing_attempts') + 1
+        )
+        if files[0].dispatched_at:
+            metrics.PROCESSING_QUEUE_WAIT_SECONDS.observe((now - files[0].dispatched_at).total_seconds())
+
+        for index, file_upload in enumerate(files):
+            if index:
+                # Heartbeat the files still waiting in this batch for the stale reaper
+                FileUpload.objects.filter(id__in=[f.id for f in files[index:]]).update(heartbeat_at=timezone.now())
+
+            started = time.perf_counter()
+            outcome = 'failed'
+            timed_out = False
+            try:
+                # The files still waiting in this batch stay alive too
+                word_count = process_file(file_upload, heartbeat_ids=[f.id for f in files[index:]])
+                activities.append(processed_activity(file_upload, word_count))
+                outcome = 'success'
+            except SoftTimeLimitExceeded as e:
+                timed_out = True
+                logger.error(f"Batch {self.request.id} ran out of time on file {file_upload.id}")
+                try:
+                    mark_file_failed(file_upload, e)
+                except Exception as error:
+                    logger.error(f"Error failing file {file_upload.id} in batch: {str(error)}")
+            except Exception as e:
+                # A failure while recording the error must not take the rest of the batch with it
+                try:
+                    outcome = fail_batch_file(self.request.id, file_upload, e)
+                except Exception as error:
+                    logger.error(f"Error recording failure of file {file_upload.id} in batch: {str(error)}")
+            finally:
+                metrics.PROCESSING_SECONDS.labels(
+                    file_type=file_upload.file_type,
+                    outcome=outcome
+                ).observe(time.perf_counter() - started)
+                if outcome == 'success':
+                    completed += 1
+                elif outcome == 'retry':
+                    requeued += 1
+                else:
+                    failed += 1
+
+            if timed_out:
+                # Hand the files not started yet back to the scheduler
+                remaining = [f.id for f in files[index + 1:]]
+                if remaining:
+                    # They never started, this run does not count as one of their attempts
+                    FileUpload.objects.filter(id__in=remaining).update(processing_attempts=F('processing_attempts') - 1)
+                    requeued += requeue_files(remaining)
+                break
+
+        logger.info(f"Batch processed: {completed} completed, {failed} failed, {requeued} requeued")
+        return {'status': 'success', 'completed': completed, 'failed': failed, 'requeued': requeued}
+
+    finally:
+        # Files finished before an error or the time limit keep their activity
+        if activities:
+            try:
+                ActivityLog.objects.bulk_create(activities)
+            except Exception as e:
+                logger.error(f"Error logging activities of batch {self.request.id}: {str(e)}")
+
+        # One slot for the whole batch, then start the user's next waiting files
+        if user_id is not None:
+            release_slot(user_id)
+            dispatch_pending(user_ids=[user_id])
+
+
+@shared_task(ignore_result=True)
+def dispatch_pending_files():
+    """
+    Periodic scheduler run, picks up files that were waiting for a free slot
+    """
+    return dispatch_pending()
+
+
+@shared_task(ignore_result=True)
+def relay_processing_outbox():
+    """
+    Periodic outbox relay, catches entries whose after-commit relay did not run
+    """
+    return relay_outbox()
+
+
+@shared_task
+def reap_stale_processing():
+    """
+    Periodic reconciliation of files stuck in processing
+    """
+    return reap_stale_files()
+
+
+@shared_task(ignore_result=True)
+def purge_pending_removals():
+    """
+    Remove stored files of deleted uploads, queued after commit and run periodically
+    """
+    return purge_removed_files()
+
+
+@shared_task
+def reconcile_upload_storage():
+    """
+    Periodic storage reconciliation, handles files without a row per UPLOAD_ORPHAN_ACTION
+    """
+    return reconcile_storage()
+
 
 def count_words_txt(file_path):
     """Count words in a .txt file"""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-    except UnicodeDecodeError:
-        try:
-            with open(file_path, 'r', encoding='latin-1') as file:
-                content = file.read()
-        except:
-            with open(file_path, 'r', encoding='cp1252') as file:
-                content = file.read()
-    
-    words = re.findall(r'\b\w+\b', content)
-    return len(words)
+    return count_words(iter_txt_chunks(file_path))
 
 
 def count_words_docx(file_path):
     """Count words in a .docx file"""
-    if not DOCX_AVAILABLE:
+    # python-docx itself is only imported once a document is read
+    if not EXTRACTORS['.docx'].available():
         raise ImportError("python-docx is required to process .docx files")
-    
-    doc = Document(file_path)
-    
-    word_count = 0
-    for paragraph in doc.paragraphs:
-        words = re.findall(r'\b\w+\b', paragraph.text)
-        word_count += len(words)
-
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                words = re.findall(r'\b\w+\b', cell.text)
-                word_count += len(words)
-    
-    return word_count
\ No newline at end of file
+
+    return count_words(iter_docx_chunks(file_path))
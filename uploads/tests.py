@@ -1,3 +1,376 @@
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, override_settings
+from datetime import timedelta
+from django.utils import timezone
+from celery.exceptions import SoftTimeLimitExceeded
+from unittest import mock
+from aamarpay_file_upload import versioning
+from aamarpay_file_upload.testing import QueryBudgetTestMixin
+from payments.models import PaymentTransaction
+from .benchmarks import BenchmarkError, run_case
+from .bulk import iter_archive
+from .extraction import MAX_CARRY_LENGTH, count_words, iter_word_batches
+from .models import FileUpload, ActivityLog, ProcessingDeadLetter
+from .reaper import reap_stale_files
+from .scheduler import acquire_slot, free_slots, requeue_files
+from .search import LexemeQuery, SearchIndexer, build_tsquery, normalize_terms, search_files
+from .serializers import FileSearchResultSerializer
+from .tasks import keep_alive, process_file_batch, process_file_word_count, requeue_batch_file
+import errno
+import io
+import os
+import shutil
+import tempfile
+import time
+import zipfile
 
-# Create your tests here.
+
+def create_file(user, **fields):
+    """FileUpload row without a stored file"""
+    fields.setdefault('filename', 'notes.txt')
+    fields.setdefault('file_type', '.txt')
+    return FileUpload.objects.create(user=user, **fields)
+
+
+class RequeueFilesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pass12345')
+
+    def test_requeue_resets_dispatch_and_bumps_files_version(self):
+        upload = create_file(self.user, status='failed', task_id='task-1')
+        before = versioning.get_versions(self.user.pk, [versioning.FILES])[versioning.FILES]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(requeue_files([upload.id]), 1)
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, 'processing')
+        self.assertEqual(upload.task_id, '')
+        self.assertIsNone(upload.dispatched_at)
+        after = versioning.get_versions(self.user.pk, [versioning.FILES])[versioning.FILES]
+        self.assertGreater(after, before)
+
+
+class FileAPIQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pass12345')
+        for i in range(3):
+            upload = create_file(self.user, filename=f'notes{i}.txt', status='completed', word_count=2)
+            indexer = SearchIndexer()
+            indexer.feed(['hello', f'world{i}'])
+            indexer.save(upload)
+            ActivityLog.objects.create(user=self.user, action='file_uploaded', metadata={'filename': upload.filename})
+        self.client.force_login(self.user)
+
+    def test_list_files(self):
+        response = self.assertQueryBudget('uploads:api_list_files')
+        self.assertEqual(response.status_code, 200)
+
+    def test_search_files(self):
+        response = self.assertQueryBudget('uploads:api_search_files', data={'q': 'hello'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 3)
+
+    def test_list_activities(self):
+        response = self.assertQueryBudget('uploads:api_list_activities')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_activities'], 3)
+
+
+class UnderscoreSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pass12345')
+        self.upload = create_file(self.user, status='completed', word_count=2)
+        indexer = SearchIndexer()
+        indexer.feed(['config_value', 'set'])
+        indexer.save(self.upload)
+
+    def test_underscore_term_is_one_lexeme(self):
+        self.assertEqual(build_tsquery(sorted(normalize_terms('set CONFIG_VALUE'))), "'config_value' & 'set'")
+
+    def test_postgres_query_skips_the_text_parser(self):
+        query = LexemeQuery(build_tsquery(['config_value']))
+        self.assertEqual(query.template, '(%(expressions)s)::tsquery')
+        self.assertEqual(query.source_expressions[0].value, "'config_value'")
+
+    def test_queryset_keeps_rank(self):
+        results = FileSearchResultSerializer(search_files(self.user, 'set'), many=True).data
+        self.assertEqual(results[0]['id'], self.upload.id)
+        self.assertEqual(results[0]['rank'], 1.0)
+
+    def test_underscore_term_is_found(self):
+        self.assertEqual(list(search_files(self.user, 'config_value')), [self.upload])
+        self.assertEqual(list(search_files(self.user, 'config')), [])
+
+
+@override_settings(UPLOAD_PROCESSING_MAX_RETRIES=2, UPLOAD_RETRY_BACKOFF=5, UPLOAD_RETRY_BACKOFF_MAX=600)
+class BatchRetryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pass12345')
+
+    def run_batch(self, upload):
+        """Run the batch task in process, every file fails with a transient storage error"""
+        failing = mock.patch('uploads.tasks.process_file', side_effect=OSError(errno.EIO, 'I/O error'))
+        delayed = mock.patch('uploads.tasks.requeue_batch_file.apply_async')
+        with failing, delayed as apply_async:
+            process_file_batch.apply(args=[[upload.id]], task_id=upload.task_id)
+        upload.refresh_from_db()
+        return apply_async
+
+    def test_transient_error_requeues_after_backoff(self):
+        upload = create_file(self.user, task_id='batch-1', dispatched_at=timezone.now())
+        apply_async = self.run_batch(upload)
+
+        apply_async.assert_called_once()
+        self.assertLessEqual(apply_async.call_args.kwargs['countdown'], 5)
+        # Still claimed, by the delayed requeue rather than the scheduler
+        self.assertEqual(upload.status, 'processing')
+        self.assertEqual(upload.task_id, apply_async.call_args.kwargs['task_id'])
+        self.assertIsNotNone(upload.dispatched_at)
+
+    def test_exhausted_file_is_dead_lettered(self):
+        upload = create_file(self.user, task_id='batch-1', dispatched_at=timezone.now(), processing_attempts=2)
+        apply_async = self.run_batch(upload)
+
+        apply_async.assert_not_called()
+        self.assertEqual(upload.status, 'failed')
+        letter = ProcessingDeadLetter.objects.get(file_upload=upload)
+        self.assertEqual(letter.attempts, 3)
+        self.assertEqual(letter.task_id, 'batch-1')
+
+    @mock.patch('uploads.tasks.dispatch_pending')
+    def test_delayed_requeue_returns_file_to_scheduler(self, dispatch_pending):
+        upload = create_file(self.user, task_id='retry-1', dispatched_at=timezone.now())
+        requeue_batch_file.apply(args=[upload.id], task_id='retry-1')
+
+        upload.refresh_from_db()
+        self.assertIsNone(upload.dispatched_at)
+        dispatch_pending.assert_called_once_with(user_ids=[self.user.pk])
+
+    @mock.patch('uploads.tasks.dispatch_pending')
+    def test_delayed_requeue_skips_reclaimed_file(self, dispatch_pending):
+        upload = create_file(self.user, task_id='reaped-and-redispatched', dispatched_at=timezone.now())
+        requeue_batch_file.apply(args=[upload.id], task_id='retry-1')
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.task_id, 'reaped-and-redispatched')
+        dispatch_pending.assert_not_called()
+
+
+@mock.patch('uploads.tasks.dispatch_pending')
+class BatchFailureTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pass12345')
+        self.uploads = [
+            create_file(self.user, filename=f'notes{i}.txt', task_id='batch-1', dispatched_at=timezone.now())
+            for i in range(3)
+        ]
+
+    def run_batch(self, **patch):
+        with mock.patch('uploads.tasks.process_file', **patch):
+            return process_file_batch.apply(args=[[upload.id for upload in self.uploads]], task_id='batch-1').get()
+
+    def test_time_limit_scales_with_batch_size(self, dispatch_pending):
+        self.assertEqual(
+            process_file_batch.soft_time_limit,
+            settings.UPLOAD_PROCESSING_TIME_LIMIT * settings.UPLOAD_BATCH_TASK_SIZE
+        )
+        self.assertGreater(process_file_batch.time_limit, process_file_batch.soft_time_limit)
+
+    def test_soft_time_limit_fails_file_and_requeues_the_rest(self, dispatch_pending):
+        result = self.run_batch(side_effect=[2, SoftTimeLimitExceeded(), 2])
+
+        self.assertEqual((result['completed'], result['failed'], result['requeued']), (1, 1, 1))
+        done, timed_out, waiting = [FileUpload.objects.get(id=upload.id) for upload in self.uploads]
+        self.assertEqual(timed_out.status, 'failed')
+        self.assertEqual(waiting.status, 'processing')
+        self.assertEqual(waiting.task_id, '')
+        self.assertIsNone(waiting.dispatched_at)
+        self.assertEqual(waiting.processing_attempts, 0)
+        self.assertTrue(ActivityLog.objects.filter(action='file_processed', metadata__filename=done.filename).exists())
+
+    def test_error_while_failing_a_file_does_not_stop_the_batch(self, dispatch_pending):
+        with mock.patch('uploads.tasks.mark_file_failed', side_effect=DatabaseError('connection lost')):
+            result = self.run_batch(side_effect=[ValueError('corrupt'), 2, 2])
+
+        self.assertEqual((result['completed'], result['failed']), (2, 1))
+        self.assertEqual(ActivityLog.objects.filter(action='file_processed').count(), 2)
+        dispatch_pending.assert_called_once_with(user_ids=[self.user.pk])
+
+
+class ProcessFileTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pass12345')
+
+    def test_result_does_not_overwrite_attempts(self):
+        upload = FileUpload(user=self.user)
+        upload.file.save('notes.txt', ContentFile(b'one two three four'))
+
+        process_file_word_count.apply(args=[upload.id])
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, 'completed')
+        self.assertEqual(upload.word_count, 4)
+        # Incremented when the task started, the completed save leaves it alone
+        self.assertEqual(upload.processing_attempts, 1)
+        self.assertIsNotNone(upload.heartbeat_at)
+
+    @override_settings(UPLOAD_HEARTBEAT_INTERVAL=0)
+    def test_heartbeat_refreshed_while_reading(self):
+        waiting = create_file(self.user)
+        reading = create_file(self.user)
+
+        chunks = list(keep_alive(iter(['one ', 'two']), [reading.id, waiting.id]))
+
+        self.assertEqual(chunks, ['one ', 'two'])
+        for upload in (reading, waiting):
+            upload.refresh_from_db()
+            self.assertIsNotNone(upload.heartbeat_at)
+
+
+@override_settings(UPLOAD_BULK_MAX_FILES=2)
+class BulkUploadLimitTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pass12345')
+        PaymentTransaction.objects.create(user=self.user, transaction_id='txn-1', amount=100, status='completed')
+        self.client.force_login(self.user)
+
+    def archive(self, count):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as zip_file:
+            for i in range(count):
+                zip_file.writestr(f'notes{i}.txt', f'hello world {i}')
+        return SimpleUploadedFile('notes.zip', buffer.getvalue(), content_type='application/zip')
+
+    def test_members_after_the_limit_are_not_read(self):
+        read = []
+
+        def members(archive):
+            for item in iter_archive(archive):
+                read.append(item[0])
+                yield item
+
+        with mock.patch('uploads.views.iter_archive', side_effect=members):
+            response = self.client.post(reverse('uploads:api_bulk_upload_files'), {'archive': self.archive(50)})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('files', response.json())
+        self.assertEqual(len(read), 3)
+        self.assertFalse(FileUpload.objects.exists())
+
+
+class RunCaseTests(SimpleTestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.txt')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def test_result_is_reported(self):
+        result = run_case(lambda path: 42, self.path, repeat=2)
+        self.assertEqual(result['words'], 42)
+
+    def test_engine_error_is_raised(self):
+        def broken(path):
+            raise ValueError('corrupt corpus')
+
+        with self.assertRaisesRegex(BenchmarkError, 'corrupt corpus'):
+            run_case(broken, self.path, repeat=1)
+
+    def test_dead_child_is_raised(self):
+        with self.assertRaisesRegex(BenchmarkError, 'exited with code 3'):
+            run_case(lambda path: os._exit(3), self.path, repeat=1)
+
+    def test_hung_child_times_out(self):
+        with self.assertRaisesRegex(BenchmarkError, 'timed out'):
+            run_case(lambda path: time.sleep(60), self.path, repeat=1, timeout=1)
+
+
+class WordBatchTests(SimpleTestCase):
+    def test_word_split_across_chunks_is_carried(self):
+        batches = list(iter_word_batches(['one tw', 'o three', '']))
+        self.assertEqual([word for batch in batches for word in batch], ['one', 'two', 'three'])
+
+    def test_long_trailing_token_is_linear(self):
+        # A file without whitespace, the old walk-back was quadratic in the token length
+        chunks = ['x' * 65536] * 16
+        started = time.perf_counter()
+        batches = list(iter_word_batches(chunks))
+        self.assertLess(time.perf_counter() - started, 2)
+        words = [word for batch in batches for word in batch]
+        self.assertEqual(len(words), 1)
+        self.assertEqual(len(words[0]), MAX_CARRY_LENGTH)
+        self.assertEqual(count_words(['a' * 100000, ' b']), 2)
+
+
+@override_settings(UPLOAD_USER_CONCURRENCY=2)
+class DeletedWhileQueuedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pass12345')
+
+    def test_single_file_slot_is_released(self):
+        upload = create_file(self.user, task_id='task-1')
+        self.assertTrue(acquire_slot(self.user.pk))
+        file_id = upload.id
+        upload.delete()
+
+        process_file_word_count.apply(args=[file_id], kwargs={'owner_id': self.user.pk}, task_id='task-1')
+        self.assertEqual(free_slots(self.user.pk), 2)
+
+    def test_batch_slot_is_released(self):
+        uploads = [create_file(self.user, task_id='batch-1') for _ in range(3)]
+        self.assertTrue(acquire_slot(self.user.pk))
+        file_ids = [upload.id for upload in uploads]
+        FileUpload.objects.filter(id__in=file_ids).delete()
+
+        process_file_batch.apply(args=[file_ids], kwargs={'owner_id': self.user.pk}, task_id='batch-1')
+        self.assertEqual(free_slots(self.user.pk), 2)
+
+    def test_superseded_message_keeps_slot(self):
+        upload = create_file(self.user, task_id='task-2')
+        self.assertTrue(acquire_slot(self.user.pk))
+
+        process_file_word_count.apply(args=[upload.id], kwargs={'owner_id': self.user.pk}, task_id='task-1')
+        self.assertEqual(free_slots(self.user.pk), 1)
+
+
+@override_settings(UPLOAD_USER_CONCURRENCY=2, UPLOAD_STALE_HEARTBEAT_AFTER=900, UPLOAD_PROCESSING_MAX_ATTEMPTS=3)
+@mock.patch('uploads.reaper.dispatch_pending')
+@mock.patch('uploads.reaper.current_app')
+class ReaperTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pass12345')
+        self.long_ago = timezone.now() - timedelta(hours=1)
+
+    def test_stale_batch_gives_back_one_slot(self, current_app, dispatch_pending):
+        # One slot for a stale batch of three files, one for a healthy task
+        self.assertTrue(acquire_slot(self.user.pk))
+        self.assertTrue(acquire_slot(self.user.pk))
+        for _ in range(3):
+            create_file(self.user, task_id='batch-1', dispatched_at=self.long_ago, heartbeat_at=self.long_ago)
+
+        result = reap_stale_files()
+
+        self.assertEqual(result['requeued'], 3)
+        self.assertEqual(free_slots(self.user.pk), 1)
+        current_app.control.revoke.assert_called_once_with(['batch-1'])
+
+    def test_exhausted_file_fails(self, current_app, dispatch_pending):
+        upload = create_file(
+            self.user, task_id='task-1', dispatched_at=self.long_ago, heartbeat_at=self.long_ago, processing_attempts=3
+        )
+        self.assertEqual(reap_stale_files()['failed'], 1)
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, 'failed')
@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopUpload
+from .extractors import describe_extensions, get_extractor
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Multipart boundaries and headers around a file that is just under the limit
+MULTIPART_OVERHEAD = 64 * 1024
+
+ZIP_SIGNATURE = b'PK\x03\x04'
+
+
+def size_rejection(limit, what='File size'):
+    return f"{what} cannot exceed {limit // (1024 * 1024)}MB."
+
+
+def content_rejection(extension, head):
+    """Why a file with these first bytes is refused, None when it is accepted"""
+    extractor = get_extractor(extension)
+    if extractor is None:
+        return f"Only {describe_extensions()} files are allowed."
+    if not extractor.sniff(head):
+        return f"File content does not match its {extension} extension."
+    return None
+
+
+def get_upload_rejection(request, field_name='file'):
+    """Why the upload handler dropped a file, None when it was accepted"""
+    return getattr(request, 'upload_rejections', {}).get(field_name)
+
+
+def get_rejected_files(request):
+    """Every file the upload handler dropped, as {'filename', 'error'} dicts"""
+    return list(getattr(request, 'upload_rejected_files', []))
+
+
+class SniffingUploadHandler(FileUploadHandler):
+    """
+    Runs before the memory/temporary file handlers and checks each file while
+    it streams in: oversized uploads are stopped and files whose first bytes do
+    not match their extension are skipped, so neither is written to disk.
+
+    Views that set `request.bulk_upload` get the larger UPLOAD_BULK_MAX_SIZE
+    body limit and may receive zip archives.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.bulk = getattr(self.request, 'bulk_upload', False)
+        self.body_limit = settings.UPLOAD_BULK_MAX_SIZE if self.bulk else settings.UPLOAD_MAX_FILE_SIZE
+        # A body far over the limit is refused at the first chunk
+        self.oversized = content_length > self.body_limit + MULTIPART_OVERHEAD
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.extension = os.path.splitext(self.file_name or '')[1].lower()
+        self.archive = getattr(self, 'bulk', False) and self.extension == '.zip'
+
+    def reject(self, reason):
+        if not hasattr(self.request, 'upload_rejections'):
+            self.request.upload_rejections = {}
+            self.request.upload_rejected_files = []
+        self.request.upload_rejections[self.field_name] = reason
+        self.request.upload_rejected_files.append({'filename': self.file_name, 'error': reason})
+        logger.info(f"Upload of {self.file_name!r} rejected: {reason}")
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if getattr(self, 'oversized', False):
+            self.reject(size_rejection(self.body_limit, 'Upload size' if self.bulk else 'File size'))
+            raise StopUpload(connection_reset=False)
+
+        # Archive members are checked one by one once the archive is in
+        if self.archive:
+            if start == 0 and not raw_data.startswith(ZIP_SIGNATURE):
+                self.reject("File content does not match its .zip extension.")
+                raise SkipFile()
+            return raw_data
+
+        if self.received > settings.UPLOAD_MAX_FILE_SIZE:
+            self.reject(size_rejection(settings.UPLOAD_MAX_FILE_SIZE))
+            raise SkipFile()
+
+        if start == 0:
+            reason = content_rejection(self.extension, raw_data)
+            if reason:
+                self.reject(reason)
+                raise SkipFile()
+
+        return raw_data
+
+    def file_complete(self, file_size):
+        # The next handler builds the uploaded file
+        return None
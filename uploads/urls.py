@@ -5,7 +5,11 @@ app_name = 'uploads'
 
 urlpatterns = [
     path('upload/', views.FileUploadAPIView.as_view(), name='api_upload_file'),
+    path('upload/bulk/', views.BulkFileUploadAPIView.as_view(), name='api_bulk_upload_files'),
     path('files/', views.list_user_files, name='api_list_files'),
+    path('search/', views.search_user_files, name='api_search_files'),
     path('activities/', views.list_user_activities, name='api_list_activities'),
+    path('export/<str:kind>/', views.export_user_data, name='api_export'),
     path('delete/<int:file_id>/', views.FileDeleteAPIView.as_view(), name='api_delete_file'),
+    path('delete/bulk/', views.bulk_delete_files, name='api_bulk_delete_files'),
 ]
\ No newline at end of file
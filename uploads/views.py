@@ -1,19 +1,30 @@
 from rest_framework import status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.views import APIView
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.conf import settings
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views.decorators.http import require_http_methods
+from aamarpay_file_upload import metrics
+from aamarpay_file_upload.versioning import FILES, conditional_api
 from payments.models import PaymentTransaction
 from .models import FileUpload, ActivityLog
-from .serializers import FileUploadSerializer, ActivityLogSerializer, FileUploadListSerializer
-from .tasks import process_file_word_count
+from .serializers import FileUploadSerializer, ActivityLogSerializer, FileUploadListSerializer, FileSearchResultSerializer, BulkDeleteSerializer
+from .outbox import enqueue_for_processing
+from .extractors import allowed_extensions, describe_extensions
+from .scheduler import get_priority_lane
+from .uploadhandlers import get_rejected_files, get_upload_rejection
+from .bulk import BulkUploadError, create_batch, iter_archive
+from .search import search_files
+from .export import CONTENT_TYPES, EXPORTS, NDJSON, export_stream
 import os
 
 class FileUploadAPIView(APIView):
@@ -37,21 +48,25 @@ class FileUploadAPIView(APIView):
         serializer = FileUploadSerializer(data=request.data, context={'request': request})
         
         if serializer.is_valid():
-            file_upload = serializer.save()
-            
-            # Log activity
-            ActivityLog.objects.create(
-                user=request.user,
-                action='file_uploaded',
-                metadata={
-                    'filename': file_upload.filename,
-                    'file_size': file_upload.file_size,
-                    'file_type': file_upload.file_type
-                }
-            )
-            
-            # Trigger Celery task for word counting
-            process_file_word_count.delay(file_upload.id)
+            with transaction.atomic():
+                file_upload = serializer.save(
+                    priority=get_priority_lane(request.user, serializer.validated_data['file'].size)
+                )
+                metrics.UPLOAD_SIZE_BYTES.labels(file_type=file_upload.file_type).observe(file_upload.file_size)
+                
+                # Log activity
+                ActivityLog.objects.create(
+                    user=request.user,
+                    action='file_uploaded',
+                    metadata={
+                        'filename': file_upload.filename,
+                        'file_size': file_upload.file_size,
+                        'file_type': file_upload.file_type
+                    }
+                )
+                
+                # Queue word counting, relayed to Celery after commit
+                enqueue_for_processing(file_upload)
             
             return Response(
                 {
@@ -62,9 +77,78 @@ class FileUploadAPIView(APIView):
                 status=status.HTTP_201_CREATED
             )
         
+        # A file dropped by SniffingUploadHandler shows up as missing, report why
+        rejection = get_upload_rejection(request)
+        if rejection:
+            return Response({'file': [rejection]}, status=status.HTTP_400_BAD_REQUEST)
+        
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class BulkFileUploadAPIView(APIView):
+    """API endpoint for uploading many files, or zip archives of them, in one request"""
+    parser_classes = (MultiPartParser, FormParser)
+    permission_classes = [permissions.IsAuthenticated]
+
+    def initialize_request(self, request, *args, **kwargs):
+        # Before the body is parsed: SniffingUploadHandler allows the bulk size limit and zip archives
+        request.bulk_upload = True
+        return super().initialize_request(request, *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        has_payment = PaymentTransaction.objects.filter(
+            user=request.user,
+            status='completed'
+        ).exists()
+        
+        if not has_payment:
+            return Response(
+                {'error': 'Payment required before uploading files'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        # Files dropped by the upload handler are reported next to the accepted ones
+        files = [(uploaded_file.name, uploaded_file) for uploaded_file in request.FILES.getlist('files')]
+        rejected = get_rejected_files(request)
+        too_many = {'files': [f'At most {settings.UPLOAD_BULK_MAX_FILES} files can be uploaded at once.']}
+        if len(files) > settings.UPLOAD_BULK_MAX_FILES:
+            return Response(too_many, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            for archive in request.FILES.getlist('archive'):
+                for name, member, error in iter_archive(archive):
+                    if error:
+                        rejected.append({'filename': name, 'error': error})
+                        continue
+                    files.append((name, member))
+                    if len(files) > settings.UPLOAD_BULK_MAX_FILES:
+                        # Stop before the rest of the archive is read
+                        return Response(too_many, status=status.HTTP_400_BAD_REQUEST)
+        except BulkUploadError as e:
+            return Response({'archive': [str(e)], 'rejected': rejected}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not files:
+            return Response(
+                {'files': ['No valid files were uploaded.'], 'rejected': rejected},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        batch_id, file_uploads = create_batch(request.user, files)
+        
+        return Response(
+            {
+                'message': f'{len(file_uploads)} file(s) uploaded successfully. Processing word count...',
+                'batch_id': batch_id,
+                'files': [
+                    {'file_id': file_upload.id, 'filename': file_upload.filename}
+                    for file_upload in file_uploads
+                ],
+                'rejected': rejected
+            },
+            status=status.HTTP_201_CREATED
+        )
+
+
 class FileDeleteAPIView(APIView):
     """API endpoint for file deletion"""
     permission_classes = [permissions.IsAuthenticated]
@@ -105,22 +189,84 @@ class FileDeleteAPIView(APIView):
             )
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_delete_files(request):
+    """Delete several of the user's files at once, stored files are removed in the background"""
+    serializer = BulkDeleteSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    file_ids = serializer.validated_data['file_ids']
+    with transaction.atomic():
+        files = FileUpload.objects.filter(user=request.user, id__in=file_ids)
+        deleted = list(files.values('id', 'filename', 'file_size', 'file_type', 'word_count'))
+        
+        if deleted:
+            files.delete()
+            
+            # One entry for the whole batch
+            ActivityLog.objects.create(
+                user=request.user,
+                action='files_deleted',
+                metadata={
+                    'count': len(deleted),
+                    'total_size': sum(entry['file_size'] for entry in deleted),
+                    'files': [
+                        {key: entry[key] for key in ('filename', 'file_size', 'file_type', 'word_count')}
+                        for entry in deleted
+                    ]
+                }
+            )
+    
+    deleted_ids = {entry['id'] for entry in deleted}
+    return Response(
+        {
+            'message': f'{len(deleted_ids)} file(s) deleted successfully',
+            'deleted': sorted(deleted_ids),
+            'not_found': [file_id for file_id in file_ids if file_id not in deleted_ids]
+        },
+        status=status.HTTP_200_OK
+    )
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@conditional_api(FILES)
 def list_user_files(request):
     """List all files uploaded by the user"""
     files = FileUpload.objects.filter(user=request.user)
     serializer = FileUploadListSerializer(files, many=True)
     
+    summary = files.status_summary()
+    
     return Response({
         'files': serializer.data,
-        'total_files': files.count(),
-        'completed_files': files.filter(status='completed').count(),
-        'processing_files': files.filter(status='processing').count(),
-        'failed_files': files.filter(status='failed').count(),
+        'total_files': summary['total_files'],
+        'completed_files': summary['completed_files'],
+        'processing_files': summary['processing_files'],
+        'failed_files': summary['failed_files'],
     })
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def search_user_files(request):
+    """Ranked full-text search over the contents of the user's files"""
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response(
+            {'error': 'Query parameter "q" is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    paginator = PageNumberPagination()
+    page = paginator.paginate_queryset(search_files(request.user, query), request)
+    serializer = FileSearchResultSerializer(page, many=True)
+    
+    return paginator.get_paginated_response(serializer.data)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def list_user_activities(request):
@@ -134,6 +280,29 @@ def list_user_activities(request):
     })
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def export_user_data(request, kind):
+    """Full history of the user's files, activities or transactions as NDJSON or CSV"""
+    if kind not in EXPORTS:
+        return Response(
+            {'error': f'Unknown export, choose one of: {", ".join(EXPORTS)}'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    output = request.query_params.get('output', NDJSON)
+    if output not in CONTENT_TYPES:
+        return Response(
+            {'error': f'Unknown output, choose one of: {", ".join(CONTENT_TYPES)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    response = StreamingHttpResponse(export_stream(kind, request.user, output), content_type=CONTENT_TYPES[output])
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{output}"'
+    # Let nginx pass chunks on as they are produced
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 @require_http_methods(["GET", "POST", "DELETE"])
 def upload_file_view(request):
@@ -156,17 +325,16 @@ def upload_file_view(request):
         uploaded_file = request.FILES.get('file')
         
         if not uploaded_file:
-            messages.error(request, 'Please select a file to upload.')
+            messages.error(request, get_upload_rejection(request) or 'Please select a file to upload.')
             return render(request, 'upload.html', {'has_payment': has_payment})
         
         print(f"File received: {uploaded_file.name}, Size: {uploaded_file.size}")
         
         # Validate file extension
-        allowed_extensions = ['.txt', '.docx']
         file_extension = os.path.splitext(uploaded_file.name)[1].lower()
         
-        if file_extension not in allowed_extensions:
-            messages.error(request, 'Only .txt and .docx files are allowed.')
+        if file_extension not in allowed_extensions():
+            messages.error(request, f'Only {describe_extensions()} files are allowed.')
             return render(request, 'upload.html', {'has_payment': has_payment})
         
         # Validate file size (10MB)
@@ -175,31 +343,33 @@ def upload_file_view(request):
             return render(request, 'upload.html', {'has_payment': has_payment})
         
         try:
-            # Create file upload record
-            file_upload = FileUpload.objects.create(
-                user=request.user,
-                file=uploaded_file,
-                filename=uploaded_file.name,
-                file_size=uploaded_file.size,
-                file_type=file_extension
-            )
+            with transaction.atomic():
+                # Create file upload record
+                file_upload = FileUpload.objects.create(
+                    user=request.user,
+                    file=uploaded_file,
+                    filename=uploaded_file.name,
+                    file_size=uploaded_file.size,
+                    file_type=file_extension,
+                    priority=get_priority_lane(request.user, uploaded_file.size)
+                )
             
-            print(f"FileUpload created: ID={file_upload.id}, Path={file_upload.file.path}")
+                print(f"FileUpload created: ID={file_upload.id}, Path={file_upload.file.path}")
+                metrics.UPLOAD_SIZE_BYTES.labels(file_type=file_upload.file_type).observe(file_upload.file_size)
             
-            # Log activity
-            ActivityLog.objects.create(
-                user=request.user,
-                action='file_uploaded',
-                metadata={
-                    'filename': file_upload.filename,
-                    'file_size': file_upload.file_size,
-                    'file_type': file_upload.file_type
-                }
-            )
+                # Log activity
+                ActivityLog.objects.create(
+                    user=request.user,
+                    action='file_uploaded',
+                    metadata={
+                        'filename': file_upload.filename,
+                        'file_size': file_upload.file_size,
+                        'file_type': file_upload.file_type
+                    }
+                )
             
-            # Trigger Celery task
-            task_result = process_file_word_count.delay(file_upload.id)
-            print(f"Celery task triggered: {task_result.id}")
+                # Queue word counting, relayed to Celery after commit
+                enqueue_for_processing(file_upload)
             
             messages.success(request, f'File "{uploaded_file.name}" uploaded successfully! Word count processing started.')
             return redirect('file_list')
@@ -224,11 +394,7 @@ def file_list_view(request):
     context = {
         'user': request.user,
         'files': files,
-        'total_files': files.count(),
-        'completed_files': files.filter(status='completed').count(),
-        'processing_files': files.filter(status='processing').count(),
-        'failed_files': files.filter(status='failed').count(),
-        'total_words': sum(f.word_count for f in files.filter(status='completed')),
+        **files.status_summary(),
     }
     return render(request, 'files.html', context)
 